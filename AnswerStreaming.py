@@ -0,0 +1,80 @@
+import re
+import time
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.prompts import PromptTemplate
+
+
+def format_documents(docs):
+    """Join retrieved chunks the same way the "stuff" QA chain does"""
+    return "\n\n".join(doc.page_content for doc in docs)
+
+
+def build_answer_chain(model, prompt_template):
+    """prompt | model | text, which can be invoked or streamed token by token"""
+    prompt = PromptTemplate(template=prompt_template, input_variables=["context", "question"])
+    return prompt | model | StrOutputParser()
+
+
+class TimedStream:
+    """Wraps a token iterator and records time to first token, total time and the full text"""
+
+    def __init__(self, tokens):
+        self._tokens = tokens
+        self.started = None
+        self.time_to_first_token = None
+        self.total_time = None
+        self.text = ""
+
+    def __iter__(self):
+        self.started = time.perf_counter()
+        for token in self._tokens:
+            if self.time_to_first_token is None:
+                self.time_to_first_token = time.perf_counter() - self.started
+            self.text += token
+            yield token
+        self.total_time = time.perf_counter() - self.started
+        print(f"Answer streamed: first token {self.time_to_first_token or 0:.3f}s, total {self.total_time:.3f}s")
+
+
+class FakeStreamingChatModel(BaseChatModel):
+    """Local chat model that replays a fixed answer with a configurable first-token and per-token delay"""
+
+    response: str = "This is a canned answer streamed word by word from the fake model."
+    first_token_delay: float = 0.5
+    token_delay: float = 0.02
+
+    @property
+    def _llm_type(self):
+        return "fake-streaming"
+
+    def _tokens(self):
+        return [token for token in re.split(r"(\s+)", self.response) if token]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.first_token_delay + self.token_delay * (len(self._tokens()) - 1))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.response))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.first_token_delay)
+        for i, token in enumerate(self._tokens()):
+            if i:
+                time.sleep(self.token_delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+if __name__ == "__main__":
+    template = "Context:\n{context}\nQuestion:\n{question}\nAnswer:"
+    chain = build_answer_chain(FakeStreamingChatModel(response=" ".join(["word"] * 200)), template)
+    inputs = {"context": "timetable", "question": "what is on monday?"}
+
+    start = time.perf_counter()
+    chain.invoke(inputs)
+    print(f"Blocking answer: first visible text after {time.perf_counter() - start:.3f}s")
+
+    stream = TimedStream(chain.stream(inputs))
+    for _ in stream:
+        pass
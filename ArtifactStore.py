@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+
+ARTIFACT_ROOT = "artifacts"
+# Least recently used artifacts are removed once the store grows past this size
+ARTIFACT_STORE_MAX_BYTES = int(os.getenv("ARTIFACT_STORE_MAX_BYTES", str(512 * 2 ** 20)))
+MANIFEST_NAME = "artifact.json"
+
+
+def file_hash(path, block_size=2 ** 20):
+    """sha256 of a file's bytes, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def combined_key(keys, *params):
+    """Key of an artifact derived from other artifacts, independent of their order"""
+    return hashlib.sha256(json.dumps([sorted(keys), *params]).encode("utf-8")).hexdigest()
+
+
+def folder_size(folder):
+    return sum(os.path.getsize(os.path.join(directory, name))
+               for directory, _, names in os.walk(folder) for name in names)
+
+
+class ArtifactStore:
+    """Content-addressed ingestion outputs under one root: <root>/<key>/ holds the artifact's files and
+    an artifact.json manifest naming them. Artifacts are built in a staging folder and renamed into
+    place, so a folder with a manifest is always complete; get() marks it recently used and the least
+    recently used ones are evicted once the store exceeds max_bytes, except those pinned by this process:
+    by an owner such as a published shard, or by a job for as long as it runs (holding())."""
+
+    def __init__(self, root=ARTIFACT_ROOT, max_bytes=ARTIFACT_STORE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._pins = {}
+        self._local = threading.local()
+
+    def folder(self, key):
+        return os.path.join(self.root, key)
+
+    def _map_paths(self, manifest, convert):
+        """Apply convert to every manifest value stored under a key ending in "path" """
+        return {name: self._map_paths(value, convert) if isinstance(value, dict)
+                else convert(value) if name.lower().endswith("path") else value
+                for name, value in manifest.items()}
+
+    def get(self, key):
+        """Manifest of a stored artifact, or None; inside holding() the artifact is also pinned"""
+        owner = getattr(self._local, "owner", None)
+        if owner is None:
+            return self._get(key)
+        # Under the lock, so eviction either ran before (and get returns None) or finds it pinned
+        with self._lock:
+            manifest = self._get(key)
+            if manifest is not None:
+                self._pins.setdefault(owner, set()).add(self.folder(key))
+        return manifest
+
+    def _get(self, key):
+        folder = self.folder(key)
+        try:
+            with open(os.path.join(folder, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            # Mark as recently used so eviction keeps it
+            os.utime(folder)
+        except FileNotFoundError:
+            return None
+        return self._map_paths(manifest, lambda name: os.path.abspath(os.path.join(folder, name)))
+
+    def staging(self, key):
+        """Empty folder to write a new artifact's files into before commit()"""
+        staging_folder = f"{self.folder(key)}.tmp-{os.getpid()}-{threading.get_ident()}"
+        shutil.rmtree(staging_folder, ignore_errors=True)
+        os.makedirs(staging_folder)
+        return staging_folder
+
+    def commit(self, key, staging_folder, manifest):
+        """Publish a staged artifact. Manifest values under keys ending in "path" must be files in the
+        staging folder; they are stored by name and come back from get() as absolute paths."""
+        with open(os.path.join(staging_folder, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+            json.dump(self._map_paths(manifest, os.path.basename), f, indent=2)
+
+        folder = self.folder(key)
+        with self._lock:
+            shutil.rmtree(folder, ignore_errors=True)
+            os.replace(staging_folder, folder)
+            owner = getattr(self._local, "owner", None)
+            if owner is not None:
+                self._pins.setdefault(owner, set()).add(folder)
+            self.evict(keep=folder)
+        return self.get(key)
+
+    def pin(self, owner, keys):
+        """Keep the artifacts of keys from eviction on behalf of owner (e.g. the shard indexed from them),
+        replacing whatever owner pinned before"""
+        with self._lock:
+            self._pins[owner] = {self.folder(key) for key in keys}
+
+    def release(self, owner):
+        with self._lock:
+            self._pins.pop(owner, None)
+
+    @contextmanager
+    def holding(self):
+        """Pin every artifact this thread gets or commits until the block ends, so another job's
+        eviction cannot delete files this one has looked up and is about to read"""
+        owner = f"job:{uuid.uuid4().hex}"
+        previous = getattr(self._local, "owner", None)
+        self._local.owner = owner
+        try:
+            yield owner
+        finally:
+            self._local.owner = previous
+            self.release(owner)
+
+    def discard(self, staging_folder):
+        shutil.rmtree(staging_folder, ignore_errors=True)
+
+    def evict(self, keep=None):
+        """Delete least recently used artifacts until the store fits in max_bytes; call with the lock held"""
+        if not os.path.isdir(self.root):
+            return
+        folders = [os.path.join(self.root, name) for name in os.listdir(self.root)]
+        folders = [folder for folder in folders if os.path.isdir(folder) and ".tmp-" not in folder]
+        folders.sort(key=os.path.getmtime, reverse=True)
+        sizes = {folder: folder_size(folder) for folder in folders}
+        total = sum(sizes.values())
+        pinned = set().union(*self._pins.values())
+
+        for folder in reversed(folders):
+            if total <= self.max_bytes:
+                break
+            if folder == keep or folder in pinned:
+                continue
+            print(f"Evicting artifact {folder}")
+            shutil.rmtree(folder, ignore_errors=True)
+            total -= sizes[folder]
+
+
+artifact_store = ArtifactStore()
@@ -0,0 +1,782 @@
+import argparse
+import itertools
+import random
+import string
+import time
+
+DAY_ORDER = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+TIME_SLOTS = ["09:00-10:00", "10:00-11:00", "11:00-12:00", "12:00-1:00",
+              "1:00-2:00", "2:00-3:00", "3:00-4:00", "4:00-5:00"]
+RECESS_PERIOD = 4
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def report_latency(label, seconds):
+    print(f"{label}: p50 {percentile(seconds, 50) * 1000:.3f} ms, p99 {percentile(seconds, 99) * 1000:.3f} ms")
+
+
+def synthetic_timetable(semesters=("3", "5", "7"), sections=("A", "B", "C"), days=DAY_ORDER[:5],
+                        subjects_per_semester=8, seed=7):
+    """Timetable and subject records shaped like ExcelDataParserJson output"""
+    rng = random.Random(seed)
+    used = set()
+
+    def unique_code(length):
+        while True:
+            code = "".join(rng.choice(string.ascii_uppercase) for _ in range(length))
+            if code not in used:
+                used.add(code)
+                return code
+
+    subjects_data = []
+    subjects_by_semester = {}
+    for semester in semesters:
+        subjects_by_semester[semester] = []
+        for i in range(subjects_per_semester):
+            abbreviation = unique_code(rng.randint(2, 4))
+            faculty = unique_code(3)
+            subjects_data.append({
+                "course_code": f"22CT{semester}{i:02d}: {abbreviation.title()} Engineering {i}",
+                "subject_abbreviation": abbreviation,
+                "subject_type": "theory" if i % 3 else "practical",
+                "faculty_name": f"Prof. {faculty.title()} {unique_code(5).title()}",
+                "faculty_abbreviation": faculty
+            })
+            subjects_by_semester[semester].append((abbreviation, faculty))
+
+    timetable_data = []
+    for day, semester, (section_idx, section), period in itertools.product(
+            days, semesters, enumerate(sections), range(len(TIME_SLOTS))):
+        if period == RECESS_PERIOD:
+            continue
+        abbreviation, faculty = rng.choice(subjects_by_semester[semester])
+        room = f"CR-{semester}0{section_idx + 1}"
+        timetable_data.append({
+            "semester": semester,
+            "section": section,
+            "classroom": room,
+            "day": day,
+            "time": TIME_SLOTS[period],
+            "period": period,
+            "subject": abbreviation,
+            "faculty": faculty,
+            "room": room
+        })
+    return timetable_data, subjects_data
+
+
+def synthetic_chunks(timetable_data, subjects_data, source_metadata=None):
+    from JsonToTextFile import TimetableProcessor
+    from TimetableModel import TimetableModel
+    import TimetableChunker
+
+    processor = TimetableProcessor(TimetableModel(timetable_data, subjects_data))
+    return TimetableChunker.chunk_timetable(processor, source_metadata)
+
+
+def retrieval_questions(timetable_data, subjects_data, count=40, seed=11):
+    """Fixed question set: (question, set of chunk ids that answer it)"""
+    rng = random.Random(seed)
+    questions = []
+    for subject in rng.sample(subjects_data, min(count // 2, len(subjects_data))):
+        questions.append((f"Who teaches {subject['subject_abbreviation']}?",
+                          {f"abbreviation:{subject['subject_abbreviation']}"}))
+    for entry in rng.sample(timetable_data, count // 4):
+        questions.append((f"Which classes does {entry['faculty']} take on {entry['day']}?",
+                          {f"timetable:{e['day']}:{e['semester']}:{e['section']}" for e in timetable_data
+                           if e["faculty"] == entry["faculty"] and e["day"] == entry["day"]}))
+    for entry in rng.sample(timetable_data, count // 4):
+        questions.append((f"What is scheduled in room {entry['room']} on {entry['day']}?",
+                          {f"timetable:{entry['day']}:{entry['semester']}:{entry['section']}"}))
+    return questions
+
+
+def benchmark_retrieval(args):
+    """Hit rate and latency of pure vector search against hybrid BM25 + vector search"""
+    from EmbeddingProviders import get_embedding_provider
+    from VectorStoreManager import PartitionedStore
+
+    timetable_data, subjects_data = synthetic_timetable(subjects_per_semester=args.subjects)
+    documents = synthetic_chunks(timetable_data, subjects_data)
+    embeddings = get_embedding_provider(args.provider)
+    store = PartitionedStore.from_embeddings(
+        documents, embeddings.embed_documents([document.page_content for document in documents]), embeddings)
+    questions = retrieval_questions(timetable_data, subjects_data)
+    print(f"{len(documents)} chunks, {len(questions)} questions, k={args.k}, embeddings={embeddings.model}")
+
+    modes = {
+        "vector": lambda question, vector: store.similarity_search_by_vector(vector, args.k),
+        "hybrid": lambda question, vector: store.hybrid_search_by_vector(question, vector, args.k),
+    }
+    for mode, search in modes.items():
+        hits = 0
+        latencies = []
+        for question, expected in questions:
+            vector = embeddings.embed_query(question)
+            start = time.perf_counter()
+            results = search(question, vector)
+            latencies.append(time.perf_counter() - start)
+            if expected & {document.metadata.get("chunk_id") for document in results}:
+                hits += 1
+        print(f"{mode:>7}: hit@{args.k} {hits / len(questions):.1%}")
+        report_latency(f"{mode:>7}", latencies)
+
+
+def synthetic_vectors(count, dim, clusters=64, seed=3):
+    """Clustered float32 vectors, closer to real embeddings than uniform noise"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    assignments = rng.integers(0, clusters, size=count)
+    vectors = centers[assignments] + 0.35 * rng.normal(size=(count, dim)).astype(np.float32)
+    return vectors.astype(np.float32)
+
+
+def search_one_by_one(index, queries, k):
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query.reshape(1, -1), k)
+        latencies.append(time.perf_counter() - start)
+        results.append(ids[0])
+    return results, latencies
+
+
+def recall_at_k(results, ground_truth, k):
+    found = sum(len(set(result[:k]) & set(truth[:k])) for result, truth in zip(results, ground_truth))
+    return found / (k * len(ground_truth))
+
+
+def benchmark_index(args):
+    """recall@k and p50/p99 single-query latency per FAISS index configuration"""
+    from VectorStoreManager import apply_search_params, create_faiss_index
+
+    corpus = synthetic_vectors(args.vectors, args.dim)
+    queries = synthetic_vectors(args.queries, args.dim, seed=5)
+    print(f"{args.vectors} vectors x {args.dim} dims, {args.queries} queries, k={args.k}")
+
+    exact = create_faiss_index(corpus, {"type": "flat"})
+    exact.add(corpus)
+    ground_truth, _ = search_one_by_one(exact, queries, args.k)
+
+    configs = [{"type": "flat"}]
+    configs += [{"type": "ivf", "nlist": args.nlist, "nprobe": nprobe} for nprobe in (1, 4, 16, 64)]
+    configs += [{"type": "hnsw", "hnsw_m": args.hnsw_m, "ef_search": ef_search} for ef_search in (16, 32, 64, 128)]
+
+    built = {}
+    for config in configs:
+        build_key = tuple(sorted((key, value) for key, value in config.items() if key not in ("nprobe", "ef_search")))
+        if build_key not in built:
+            start = time.perf_counter()
+            index = create_faiss_index(corpus, config)
+            index.add(corpus)
+            built[build_key] = index
+            print(f"built {dict(build_key)} in {time.perf_counter() - start:.2f}s")
+        index = built[build_key]
+        apply_search_params(index, config)
+
+        results, latencies = search_one_by_one(index, queries, args.k)
+        label = ", ".join(f"{key}={value}" for key, value in config.items())
+        print(f"{label:<36} recall@{args.k} {recall_at_k(results, ground_truth, args.k):.3f}  "
+              f"p50 {percentile(latencies, 50) * 1000:.3f} ms  p99 {percentile(latencies, 99) * 1000:.3f} ms")
+
+
+def benchmark_compression(args):
+    """bytes/vector, recall@k against exact float32 search and latency per storage compression,
+    with and without exact re-ranking of the top candidates from the original vectors"""
+    from VectorStoreManager import bytes_per_vector, create_faiss_index, rerank_exact
+
+    corpus = synthetic_vectors(args.vectors, args.dim)
+    queries = synthetic_vectors(args.queries, args.dim, seed=5)
+    print(f"{args.vectors} vectors x {args.dim} dims, {args.queries} queries, k={args.k}, type={args.type}")
+
+    exact = create_faiss_index(corpus, {"type": "flat", "compression": "none"})
+    exact.add(corpus)
+    ground_truth, _ = search_one_by_one(exact, queries, args.k)
+
+    for compression in ("none", "fp16", "int8", "pq"):
+        config = {"type": args.type, "compression": compression, "pq_m": args.pq_m}
+        start = time.perf_counter()
+        index = create_faiss_index(corpus, config)
+        index.add(corpus)
+        print(f"built {compression} in {time.perf_counter() - start:.2f}s, "
+              f"{bytes_per_vector(index):.1f} bytes/vector (float32 data: {4 * args.dim})")
+
+        for rerank in (False, True) if compression != "none" else (False,):
+            results = []
+            latencies = []
+            candidates = args.k * args.rerank_factor if rerank else args.k
+            for query in queries:
+                start = time.perf_counter()
+                _, ids = index.search(query.reshape(1, -1), candidates)
+                positions = rerank_exact(query, ids[0], corpus, args.k)[0] if rerank else ids[0]
+                latencies.append(time.perf_counter() - start)
+                results.append(positions)
+            label = f"{compression}" + (f" + rerank x{args.rerank_factor}" if rerank else "")
+            print(f"{label:<20} recall@{args.k} {recall_at_k(results, ground_truth, args.k):.3f}  "
+                  f"p50 {percentile(latencies, 50) * 1000:.3f} ms  p99 {percentile(latencies, 99) * 1000:.3f} ms")
+
+
+SHEET_BLOCK_HEIGHT = 33
+SHEET_DAYS = DAY_ORDER[:5]
+
+
+class SyntheticSheet:
+    """Minimal xlrd-like sheet (nrows, ncols, merged_cells, cell_value) laid out like the department
+    timetable workbooks: semester/section header rows, day rows with merged practicals, merged blank
+    spacer rows and a theory/practical subjects table"""
+
+    def __init__(self, name, cells, merged_cells, nrows, ncols):
+        self.name = name
+        self._cells = cells
+        self.merged_cells = merged_cells
+        self.nrows = nrows
+        self.ncols = ncols
+
+    def cell_value(self, row_idx, col_idx):
+        return self._cells.get((row_idx, col_idx), "")
+
+
+def synthetic_sheet(name, ncols=30, subjects=40, blocks=5, seed=13):
+    rng = random.Random(seed)
+    cells = {}
+    merged_cells = []
+    abbreviations = ["".join(rng.choice(string.ascii_uppercase) for _ in range(3)) for _ in range(subjects)]
+    header_rows = [4 + SHEET_BLOCK_HEIGHT * block for block in range(blocks)]
+
+    for block, header_row in enumerate(header_rows):
+        cells[(header_row, 1)] = f"Semester :- {3 + 2 * (block % 3)}"
+        cells[(header_row, 5)] = f"Section :- {'ABC'[block % 3]} CLASSROOM: CR-{300 + block}"
+        merged_cells += [(header_row, header_row + 1, 1, 5), (header_row, header_row + 1, 5, 8)]
+        for day_offset, day in enumerate(SHEET_DAYS):
+            row_idx = header_row + 2 + day_offset
+            cells[(row_idx, 0)] = day
+            col_idx = 2
+            while col_idx < 10:
+                if col_idx == 6:
+                    cells[(row_idx, col_idx)] = "RECESS"
+                    col_idx += 1
+                    continue
+                width = 2 if col_idx in (7, 8) and rng.random() < 0.4 else 1
+                cells[(row_idx, col_idx)] = f"{rng.choice(abbreviations)}\n({rng.choice(abbreviations)})"
+                if width > 1:
+                    merged_cells.append((row_idx, row_idx + 1, col_idx, col_idx + width))
+                col_idx += width
+        next_header = header_rows[block + 1] if block + 1 < len(header_rows) else header_row + 9
+        # Blank spacer rows merged across the sheet, as in the real workbooks
+        merged_cells += [(row_idx, row_idx + 1, 0, ncols) for row_idx in range(header_row + 7, next_header)]
+
+    row_idx = header_rows[-1] + 10
+    for subject_type, heading in (("theory", "THEORY SUBJECT"), ("practical", "PRACTICAL")):
+        cells[(row_idx, 0)] = heading
+        cells[(row_idx + 1, 0)] = "Course code:"
+        row_idx += 2
+        for i, abbreviation in enumerate(abbreviations[:subjects // 2]):
+            cells[(row_idx, 0)] = f"22CT{i:03d}"
+            cells[(row_idx, 1)] = f"{abbreviation.title()} {subject_type.title()}"
+            cells[(row_idx, 3)] = abbreviation
+            cells[(row_idx, 4)] = f"Prof. {abbreviation.title()}"
+            cells[(row_idx, 5)] = abbreviation
+            merged_cells.append((row_idx, row_idx + 1, 1, 3))
+            if subject_type == "practical":
+                cells[(row_idx, 6)] = "Lab staff"
+                merged_cells.append((row_idx, row_idx + 1, 6, 9))
+            row_idx += 1
+    return SyntheticSheet(name, cells, merged_cells, row_idx, ncols)
+
+
+class LinearMergedCells:
+    """The pre-index lookup: scan every merged range for each cell"""
+
+    def __init__(self, sheet):
+        from ExcelDataParserJson import get_merged_cell_value
+
+        self.sheet = sheet
+        self.lookup = get_merged_cell_value
+
+    def value(self, row_idx, col_idx):
+        return self.lookup(self.sheet, row_idx, col_idx)
+
+
+def benchmark_parser(args):
+    """Single-pass sheet parsing time with per-cell scans of merged ranges against the precomputed
+    merged-cell index"""
+    from ExcelDataParserJson import MergedCellIndex, iter_sheet_records
+
+    sheets = [synthetic_sheet(f"Sheet{i}", args.columns, args.subjects, args.blocks, seed=i)
+              for i in range(args.sheets)]
+    merged = sum(len(sheet.merged_cells) for sheet in sheets)
+    print(f"{args.sheets} sheets x {sheets[0].nrows} rows x {args.columns} columns, {merged} merged ranges")
+
+    outputs = {}
+    for label, index_type in (("linear scan", LinearMergedCells), ("merged index", MergedCellIndex)):
+        start = time.perf_counter()
+        records = [record for sheet in sheets for record in iter_sheet_records(sheet, index_type(sheet))]
+        elapsed = time.perf_counter() - start
+        outputs[label] = records
+        print(f"{label:>12}: {elapsed:.3f}s ({elapsed / args.sheets * 1000:.1f} ms/sheet), "
+              f"{sum(kind == 'timetable' for kind, _ in records)} lectures, "
+              f"{sum(kind == 'subjects' for kind, _ in records)} subjects")
+    assert outputs["linear scan"] == outputs["merged index"], "parsers disagree"
+
+
+def write_synthetic_workbook(path, sheets):
+    import openpyxl
+
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    for sheet in sheets:
+        worksheet = workbook.create_sheet(sheet.name)
+        for (row_idx, col_idx), value in sheet._cells.items():
+            worksheet.cell(row_idx + 1, col_idx + 1, value)
+        for rlo, rhi, clo, chi in sheet.merged_cells:
+            worksheet.merge_cells(start_row=rlo + 1, end_row=rhi, start_column=clo + 1, end_column=chi)
+    workbook.save(path)
+
+
+class LoadedXlsxSheet:
+    """xlrd-like view of a fully loaded openpyxl sheet, the eager baseline"""
+
+    def __init__(self, worksheet):
+        self.name = worksheet.title
+        self.nrows = worksheet.max_row
+        self.ncols = worksheet.max_column
+        self.merged_cells = [(merged.min_row - 1, merged.max_row, merged.min_col - 1, merged.max_col)
+                             for merged in worksheet.merged_cells.ranges]
+        self._worksheet = worksheet
+
+    def cell_value(self, row_idx, col_idx):
+        value = self._worksheet.cell(row_idx + 1, col_idx + 1).value
+        return "" if value is None else value
+
+
+def benchmark_workbook(args):
+    """Open time, parse time and peak Python memory of an eagerly loaded workbook against the
+    sheet-at-a-time reader, on a synthetic multi-sheet .xlsx"""
+    import os
+    import tempfile
+    import tracemalloc
+
+    import openpyxl
+    from ExcelDataParserJson import MergedCellIndex, iter_sheet_records
+    from WorkbookReader import iter_workbook_sheets
+
+    sheets = [synthetic_sheet(f"Sheet{i}", args.columns, args.subjects, args.blocks, seed=i)
+              for i in range(args.sheets)]
+    expected = [record for sheet in sheets for record in iter_sheet_records(sheet)]
+    path = os.path.join(tempfile.mkdtemp(), "synthetic_timetable.xlsx")
+    write_synthetic_workbook(path, sheets)
+    print(f"{args.sheets} sheets x {sheets[0].nrows} rows x {args.columns} columns, "
+          f"{os.path.getsize(path) // 1024} KB .xlsx")
+
+    def eager():
+        workbook = openpyxl.load_workbook(path)
+        yield
+        for worksheet in workbook.worksheets:
+            yield LoadedXlsxSheet(worksheet)
+
+    def streamed():
+        yield
+        yield from iter_workbook_sheets(path)
+
+    for label, open_sheets in (("full load", eager), ("streamed", streamed)):
+        tracemalloc.start()
+        start = time.perf_counter()
+        sheet_iter = open_sheets()
+        next(sheet_iter)
+        opened = time.perf_counter() - start
+        records = [record for sheet in sheet_iter for record in iter_sheet_records(sheet, MergedCellIndex(sheet))]
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{label:>9}: open {opened:.3f}s, open+parse {elapsed:.3f}s, peak {peak / 2 ** 20:.1f} MiB, "
+              f"{len(records)} records" + ("" if records == expected else " (MISMATCH)"))
+
+
+def benchmark_sheets(args):
+    """Wall time of parsing one multi-sheet workbook serially and with 2..N sheet worker processes"""
+    import os
+    import tempfile
+
+    from ExcelDataParserJson import iter_excel_records
+
+    sheets = [synthetic_sheet(f"Sheet{i}", args.columns, args.subjects, args.blocks, seed=i)
+              for i in range(args.sheets)]
+    path = os.path.join(tempfile.mkdtemp(), "synthetic_timetable.xlsx")
+    write_synthetic_workbook(path, sheets)
+    max_workers = args.max_workers or os.cpu_count() or 1
+    print(f"{args.sheets} sheets x {sheets[0].nrows} rows, {os.cpu_count()} CPU cores")
+
+    start = time.perf_counter()
+    expected = list(iter_excel_records(path, sheet_workers=1))
+    serial = time.perf_counter() - start
+    print(f"serial   : {serial:.3f}s, {len(expected)} records")
+    for workers in range(2, max_workers + 1):
+        start = time.perf_counter()
+        records = list(iter_excel_records(path, sheet_workers=workers))
+        elapsed = time.perf_counter() - start
+        print(f"{workers:>2} workers: {elapsed:.3f}s, speedup {serial / elapsed:.2f}x"
+              + ("" if records == expected else " (MISMATCH)"))
+
+
+def benchmark_formats(args):
+    """File size and load time of the parsed-record formats: the original indent=2 JSON array,
+    JSON Lines and dictionary-encoded Parquet"""
+    import json
+    import os
+    import tempfile
+
+    import RecordFiles
+
+    timetable_data, subjects_data = synthetic_timetable(subjects_per_semester=args.subjects)
+    timetable_data = timetable_data * args.copies
+    print(f"{len(timetable_data)} timetable records, {len(subjects_data)} subjects, "
+          f"orjson {'available' if RecordFiles.orjson is not None else 'not installed (stdlib json)'}")
+    directory = tempfile.mkdtemp()
+
+    paths = {}
+    for kind, records in (("timetable", timetable_data), ("subjects", subjects_data)):
+        path = os.path.join(directory, f"{kind}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(records, f, indent=2, ensure_ascii=False)
+        paths["json (indent=2)", kind] = path
+        for record_format, extension in RecordFiles.RECORD_EXTENSIONS.items():
+            path = os.path.join(directory, kind + extension)
+            writer = RecordFiles.RecordWriter(path, kind, record_format)
+            for record in records:
+                writer.write(record)
+            writer.close()
+            paths[record_format, kind] = path
+
+    for label in ("json (indent=2)", *RecordFiles.RECORD_EXTENSIONS):
+        size = sum(os.path.getsize(paths[label, kind]) for kind in ("timetable", "subjects"))
+        seconds = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            loaded = (list(RecordFiles.iter_records(paths[label, "timetable"])),
+                      list(RecordFiles.iter_records(paths[label, "subjects"])))
+            seconds.append(time.perf_counter() - start)
+        print(f"{label:>15}: {size / 1024:9.1f} KB, load p50 {percentile(seconds, 50) * 1000:8.2f} ms"
+              + ("" if loaded == (timetable_data, subjects_data) else " (MISMATCH)"))
+
+
+def nested_scan_organize(timetable_data, subjects_data):
+    """The per-entry subject scan and per-lecture dicts the generators used before TimetableModel"""
+    from collections import defaultdict
+
+    organized_data = defaultdict(lambda: defaultdict(list))
+    for entry in timetable_data:
+        subject_info = next((item for item in subjects_data if item["subject_abbreviation"] == entry["subject"]),
+                            {"course_code": entry["subject"], "faculty_name": entry.get("faculty", ""),
+                             "faculty_abbreviation": entry.get("faculty", "")})
+        organized_data[entry["day"]][entry.get("semester", "Other")].append({
+            "time": entry["time"], "subject": entry["subject"], "subject_full": subject_info["course_code"],
+            "faculty": subject_info["faculty_abbreviation"], "faculty_full": subject_info["faculty_name"],
+            "room": entry.get("room", ""), "section": entry.get("section", "")})
+    return organized_data
+
+
+def benchmark_model(args):
+    """Organize time and retained memory of the nested subject scan against the compiled TimetableModel,
+    on record files written by the parser's JSON Lines writer"""
+    import gc
+    import os
+    import tempfile
+    import tracemalloc
+
+    import RecordFiles
+    from TimetableModel import Lecture, TimetableModel
+
+    directory = tempfile.mkdtemp()
+    for copies in args.copies:
+        timetable_data, subjects_data = synthetic_timetable(subjects_per_semester=args.subjects)
+        timetable_data = [{**entry, "section": f"{entry['section']}{copy}"}
+                          for copy in range(copies) for entry in timetable_data]
+        paths = {}
+        for kind, records in (("timetable", timetable_data), ("subjects", subjects_data)):
+            paths[kind] = os.path.join(directory, f"{kind}_{copies}.jsonl")
+            writer = RecordFiles.RecordWriter(paths[kind], kind, "jsonl")
+            for record in records:
+                writer.write(record)
+            writer.close()
+        del timetable_data, subjects_data
+
+        def nested_scan():
+            return nested_scan_organize(list(RecordFiles.iter_records(paths["timetable"])),
+                                        list(RecordFiles.iter_records(paths["subjects"])))
+
+        def compiled():
+            return TimetableModel.from_files(paths["timetable"], paths["subjects"]).organized_data
+
+        results = {}
+        for label, organize in (("nested scan", nested_scan), ("compiled", compiled)):
+            start = time.perf_counter()
+            organize()
+            elapsed = time.perf_counter() - start
+            # Memory is traced in a separate run, tracing slows allocation-heavy code unevenly
+            gc.collect()
+            tracemalloc.start()
+            results[label] = organize()
+            retained, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{copies * 315:>7} lectures {label:>11}: {elapsed * 1000:8.1f} ms, "
+                  f"retained {retained / 2 ** 20:6.1f} MiB, peak {peak / 2 ** 20:6.1f} MiB")
+
+        expected, organized = results["nested scan"], results["compiled"]
+        # source (the department/term label of merged uploads) has no counterpart in the nested scan
+        fields = [field for field in Lecture.__slots__ if field != "source"]
+        if {day: {semester: [{field: getattr(lecture, field) for field in fields} for lecture in lectures]
+                  for semester, lectures in semesters.items()} for day, semesters in organized.items()} != expected:
+            print("  (MISMATCH)")
+
+
+def benchmark_incremental(args):
+    """Full re-index of a revised timetable against an in-place update of the previous index, for a
+    growing number of moved lectures; counts the chunks that reach the embedding function"""
+    import os
+    import tempfile
+
+    import numpy as np
+
+    import RecordFiles
+    import VectorStoreManager
+    from EmbeddingCache import EmbeddingCache
+    from EmbeddingPipeline import EmbeddingPipeline
+    from EmbeddingProviders import get_embedding_provider
+    from IngestionJobs import TimetableIndexer
+
+    timetable_data, subjects_data = synthetic_timetable(sections=tuple(f"S{i}" for i in range(args.sections)),
+                                                        subjects_per_semester=args.subjects)
+    embeddings = get_embedding_provider("hashing")
+    directory = tempfile.mkdtemp()
+
+    def write_records(name, records_by_kind):
+        paths = []
+        for kind, records in records_by_kind:
+            paths.append(os.path.join(directory, f"{kind}_{name}.jsonl"))
+            writer = RecordFiles.RecordWriter(paths[-1], kind, "jsonl")
+            for record in records:
+                writer.write(record)
+            writer.close()
+        return tuple(paths)
+
+    def indexer(name):
+        embedded = []
+
+        def embed_fn(texts):
+            embedded.extend(texts)
+            return embeddings.embed_documents(texts)
+
+        registry = VectorStoreManager.ShardRegistry(os.path.join(directory, f"index_{name}"),
+                                                    VectorStoreManager.RetrieverCache())
+        return TimetableIndexer(embeddings, EmbeddingCache(os.path.join(directory, f"cache_{name}")),
+                                EmbeddingPipeline(embed_fn), registry, {"type": args.type}), embedded
+
+    previous = write_records("v1", (("timetable", timetable_data), ("subjects", subjects_data)))
+    rng = random.Random(5)
+    rooms = sorted({entry["room"] for entry in timetable_data})
+    print(f"{len(timetable_data)} lectures, {args.type} index")
+    for changes in args.changes:
+        revised = [dict(entry) for entry in timetable_data]
+        for entry in rng.sample(revised, changes):
+            entry["room"] = rng.choice(rooms)
+        revised_paths = write_records(f"v2_{changes}", (("timetable", revised), ("subjects", subjects_data)))
+
+        full, full_embedded = indexer(f"full_{changes}")
+        start = time.perf_counter()
+        full_folder = full.index_folder(revised_paths, shard="benchmark")
+        full_seconds = time.perf_counter() - start
+
+        incremental, incremental_embedded = indexer(f"incremental_{changes}")
+        incremental.index_folder(previous, shard="benchmark")
+        incremental_embedded.clear()
+        start = time.perf_counter()
+        incremental_folder = incremental.index_folder(revised_paths, shard="benchmark")
+        incremental_seconds = time.perf_counter() - start
+
+        # Both indexes must hold the same chunks and answer the same way
+        full_store = VectorStoreManager.PartitionedStore.load_local(full_folder, embeddings)
+        incremental_store = VectorStoreManager.PartitionedStore.load_local(incremental_folder, embeddings)
+        same = (sorted(map(VectorStoreManager.document_digest, full_store.documents()))
+                == sorted(map(VectorStoreManager.document_digest, incremental_store.documents())))
+        for entry in rng.sample(revised, 10):
+            query = np.asarray(embeddings.embed_query(f"{entry['day']} {entry['subject']} room {entry['room']}"))
+            same &= ([document.metadata["chunk_id"] for document in full_store.similarity_search_by_vector(query, 4)]
+                     == [document.metadata["chunk_id"]
+                         for document in incremental_store.similarity_search_by_vector(query, 4)])
+        print(f"{changes:>5} moved lectures: full {full_seconds:6.2f}s ({len(full_embedded)} chunks embedded), "
+              f"incremental {incremental_seconds:6.2f}s ({len(incremental_embedded)} chunks embedded)"
+              + ("" if same else " (MISMATCH)"))
+
+
+def concatenated_html(organized_data, abbreviations, day_order, semester_order):
+    """The += f-string concatenation TimetableGenerator.generate_html used before the Jinja2 template"""
+    html_content = "<html><body>"
+    for day in day_order:
+        if day in organized_data:
+            html_content += f"""
+            <div class="day-section">
+                <h2 class="day-header">{day}</h2>
+            """
+            for semester in semester_order:
+                if semester in organized_data[day]:
+                    html_content += f"""
+                    <div class="semester-section">
+                        <div class="semester-header">Semester {semester}</div>
+                        <ul class="lecture-list">
+                    """
+                    for entry in sorted(organized_data[day][semester], key=lambda x: x.time):
+                        section_display = f'<span class="section">Sec {entry.section}</span>' if entry.section else ""
+                        html_content += f"""
+                        <li class="lecture-item">
+                            <span class="time">{entry.time}</span>
+                            <span class="subject">{entry.subject}</span>
+                            <span class="faculty">{entry.faculty_full}</span>
+                            <span class="room">Room {entry.room}</span>
+                            {section_display}
+                        </li>
+                        """
+                    html_content += "</ul></div>"
+            html_content += "</div>"
+    for abbrev, details in sorted(abbreviations.items()):
+        html_content += f"""
+                    <div class="abbrev-item">
+                        <strong>{abbrev}:</strong> {details['full_form']} - {details['faculty']}
+                    </div>
+        """
+    return html_content + "</body></html>"
+
+
+def benchmark_html(args):
+    """Render time and peak memory of the timetable HTML: string concatenation, the compiled template
+    rendered to a string, and the template streamed to a file"""
+    import os
+    import tempfile
+    import tracemalloc
+
+    from JsonToPDFFile import DAY_ORDER, SEMESTER_ORDER, TimetableGenerator
+    from TimetableModel import TimetableModel
+
+    generator = TimetableGenerator()
+    html_path = os.path.join(tempfile.mkdtemp(), "timetable.html")
+
+    def stream_to_file():
+        with open(html_path, 'w', encoding='utf-8') as f:
+            generator.render_html(model.organized_data, model.abbreviations, f)
+
+    for copies in args.copies:
+        timetable_data, subjects_data = synthetic_timetable(subjects_per_semester=args.subjects)
+        model = TimetableModel([{**entry, "section": f"{entry['section']}{copy}"}
+                                for copy in range(copies) for entry in timetable_data], subjects_data)
+        del timetable_data
+        renders = {
+            "concatenation": lambda: concatenated_html(model.organized_data, model.abbreviations,
+                                                       DAY_ORDER, SEMESTER_ORDER),
+            "template": lambda: generator.generate_html(model.organized_data, model.abbreviations),
+            "template to file": stream_to_file,
+        }
+        for label, render in renders.items():
+            seconds = []
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                render()
+                seconds.append(time.perf_counter() - start)
+            tracemalloc.start()
+            render()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{copies * 315:>7} lectures {label:>16}: p50 {percentile(seconds, 50) * 1000:8.1f} ms, "
+                  f"peak {peak / 2 ** 20:6.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Performance benchmarks for the timetable assistant")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    retrieval = commands.add_parser("retrieval", help="vector vs hybrid retrieval hit rate and latency")
+    retrieval.add_argument("--provider", default="hashing", help="embedding provider (default: hashing)")
+    retrieval.add_argument("--k", type=int, default=4)
+    retrieval.add_argument("--subjects", type=int, default=8, help="subjects per semester")
+    retrieval.set_defaults(run=benchmark_retrieval)
+
+    index = commands.add_parser("index", help="recall vs latency of Flat / IVF / HNSW indexes")
+    index.add_argument("--vectors", type=int, default=50000)
+    index.add_argument("--dim", type=int, default=256)
+    index.add_argument("--queries", type=int, default=500)
+    index.add_argument("--k", type=int, default=10)
+    index.add_argument("--nlist", type=int, default=256)
+    index.add_argument("--hnsw-m", type=int, default=32)
+    index.set_defaults(run=benchmark_index)
+
+    compression = commands.add_parser("compression", help="memory vs recall of fp16 / int8 / PQ vector storage")
+    compression.add_argument("--vectors", type=int, default=50000)
+    compression.add_argument("--dim", type=int, default=256)
+    compression.add_argument("--queries", type=int, default=500)
+    compression.add_argument("--k", type=int, default=10)
+    compression.add_argument("--type", default="flat", choices=("flat", "ivf", "hnsw"))
+    compression.add_argument("--pq-m", type=int, default=32)
+    compression.add_argument("--rerank-factor", type=int, default=4)
+    compression.set_defaults(run=benchmark_compression)
+
+    parser_command = commands.add_parser("parser", help="Excel sheet parsing with and without the merged-cell index")
+    parser_command.add_argument("--sheets", type=int, default=20)
+    parser_command.add_argument("--columns", type=int, default=30)
+    parser_command.add_argument("--subjects", type=int, default=40)
+    parser_command.add_argument("--blocks", type=int, default=5, help="semester/section blocks per sheet")
+    parser_command.set_defaults(run=benchmark_parser)
+
+    workbook = commands.add_parser("workbook", help="eager vs sheet-at-a-time loading of a multi-sheet .xlsx")
+    workbook.add_argument("--sheets", type=int, default=20)
+    workbook.add_argument("--columns", type=int, default=30)
+    workbook.add_argument("--subjects", type=int, default=40)
+    workbook.add_argument("--blocks", type=int, default=5, help="semester/section blocks per sheet")
+    workbook.set_defaults(run=benchmark_workbook)
+
+    sheets_command = commands.add_parser("sheets", help="serial vs per-sheet parallel parsing of one workbook")
+    sheets_command.add_argument("--sheets", type=int, default=20)
+    sheets_command.add_argument("--columns", type=int, default=30)
+    sheets_command.add_argument("--subjects", type=int, default=40)
+    sheets_command.add_argument("--blocks", type=int, default=5, help="semester/section blocks per sheet")
+    sheets_command.add_argument("--max-workers", type=int, default=0, help="default: CPU cores")
+    sheets_command.set_defaults(run=benchmark_sheets)
+
+    formats = commands.add_parser("formats", help="size and load time of JSON vs JSON Lines vs Parquet record files")
+    formats.add_argument("--copies", type=int, default=50, help="times the synthetic timetable is repeated")
+    formats.add_argument("--subjects", type=int, default=8, help="subjects per semester")
+    formats.add_argument("--repeats", type=int, default=5)
+    formats.set_defaults(run=benchmark_formats)
+
+    model = commands.add_parser("model", help="nested subject scan vs compiled TimetableModel organize time and memory")
+    model.add_argument("--copies", type=int, nargs="+", default=[10, 40, 160],
+                       help="sections per synthetic timetable, in units of 315 lectures")
+    model.add_argument("--subjects", type=int, default=40, help="subjects per semester")
+    model.set_defaults(run=benchmark_model)
+
+    incremental = commands.add_parser("incremental", help="full re-index vs in-place update after a timetable revision")
+    incremental.add_argument("--sections", type=int, default=40)
+    incremental.add_argument("--subjects", type=int, default=8, help="subjects per semester")
+    incremental.add_argument("--changes", type=int, nargs="+", default=[1, 10, 100], help="lectures moved")
+    incremental.add_argument("--type", default="flat", choices=("flat", "ivf", "hnsw"))
+    incremental.set_defaults(run=benchmark_incremental)
+
+    html = commands.add_parser("html", help="string concatenation vs compiled streaming template for the timetable HTML")
+    html.add_argument("--copies", type=int, nargs="+", default=[10, 40, 160],
+                      help="sections per synthetic timetable, in units of 315 lectures")
+    html.add_argument("--subjects", type=int, default=8, help="subjects per semester")
+    html.add_argument("--repeats", type=int, default=3)
+    html.set_defaults(run=benchmark_html)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+
+import numpy as np
+
+EMBEDDING_CACHE_DIR = "embedding_cache"
+
+
+def chunk_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Chunk embeddings on disk: SQLite maps (model, chunk hash) to a row of a float32 matrix file
+    that is read back through a memory map, so unchanged chunks are never sent to the API again"""
+
+    def __init__(self, cache_dir=EMBEDDING_CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(cache_dir, "embeddings.sqlite"),
+                                   check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                chunk_hash TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                row INTEGER NOT NULL,
+                PRIMARY KEY (model, chunk_hash)
+            )
+        """)
+
+    def _matrix_path(self, model, dim):
+        safe_model = re.sub(r'[^a-zA-Z0-9_.-]', '_', model)
+        return os.path.join(self.cache_dir, f"{safe_model}_{dim}.f32")
+
+    def get_many(self, model, hashes):
+        """Return {chunk_hash: vector} for the hashes already cached for this model"""
+        found = {}
+        with self._lock:
+            rows = []
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows.extend(self._db.execute(
+                    f"SELECT chunk_hash, dim, row FROM embeddings WHERE model = ? AND chunk_hash IN ({placeholders})",
+                    [model, *batch]).fetchall())
+
+        rows_by_dim = {}
+        for hash_value, dim, row in rows:
+            rows_by_dim.setdefault(dim, []).append((hash_value, row))
+
+        for dim, entries in rows_by_dim.items():
+            path = self._matrix_path(model, dim)
+            total_rows = os.path.getsize(path) // (dim * 4)
+            matrix = np.memmap(path, dtype=np.float32, mode="r", shape=(total_rows, dim))
+            for hash_value, row in entries:
+                found[hash_value] = np.array(matrix[row])
+            del matrix
+        return found
+
+    def put_many(self, model, hashes, vectors):
+        """Append new vectors to the model's matrix file and record their rows"""
+        if not hashes:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        dim = vectors.shape[1]
+        path = self._matrix_path(model, dim)
+
+        with self._lock:
+            # BEGIN IMMEDIATE takes the database write lock, which also serialises
+            # appends to the matrix file between processes
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                first_row = os.path.getsize(path) // (dim * 4) if os.path.exists(path) else 0
+                with open(path, "ab") as f:
+                    f.write(vectors.tobytes())
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, chunk_hash, dim, row) VALUES (?, ?, ?, ?)",
+                    [(model, hash_value, dim, first_row + i) for i, hash_value in enumerate(hashes)])
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def embed_documents(self, texts, model, embed_fn):
+        """Embed texts through the cache; embed_fn(list_of_texts) is only called for unseen chunks"""
+        hashes = [chunk_hash(text) for text in texts]
+        cached = self.get_many(model, list(dict.fromkeys(hashes)))
+
+        missing = {}
+        for hash_value, text in zip(hashes, texts):
+            if hash_value not in cached and hash_value not in missing:
+                missing[hash_value] = text
+
+        print(f"Embedding cache: {len(cached)} chunks cached, {len(missing)} to embed")
+        if missing:
+            new_vectors = embed_fn(list(missing.values()))
+            self.put_many(model, list(missing.keys()), new_vectors)
+            for hash_value, vector in zip(missing.keys(), new_vectors):
+                cached[hash_value] = np.asarray(vector, dtype=np.float32)
+
+        return [cached[hash_value].tolist() for hash_value in hashes]
@@ -0,0 +1,108 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))
+EMBEDDING_MAX_WORKERS = int(os.getenv("EMBEDDING_MAX_WORKERS", "4"))
+EMBEDDING_REQUESTS_PER_MINUTE = int(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", "0"))  # 0 = unlimited
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "3"))
+
+
+class RateLimiter:
+    """Spaces calls out evenly so they stay under a requests-per-minute budget"""
+
+    def __init__(self, requests_per_minute=0):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = time.monotonic()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class EmbeddingPipeline:
+    """Embeds chunks in batches on a bounded thread pool, with rate limiting and per-batch retries"""
+
+    def __init__(self, embed_fn, batch_size=EMBEDDING_BATCH_SIZE, max_workers=EMBEDDING_MAX_WORKERS,
+                 requests_per_minute=EMBEDDING_REQUESTS_PER_MINUTE, max_retries=EMBEDDING_MAX_RETRIES,
+                 backoff_seconds=1.0):
+        self.embed_fn = embed_fn
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.rate_limiter = RateLimiter(requests_per_minute)
+        self.last_stats = {}
+
+    def _embed_batch(self, batch):
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                return self.embed_fn(batch)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise Exception(f"Embedding batch of {len(batch)} chunks failed after "
+                                    f"{attempt + 1} attempts: {str(e)}")
+                delay = self.backoff_seconds * (2 ** attempt) * (1 + random.random() * 0.25)
+                print(f"Embedding batch failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def embed_documents(self, texts):
+        """Embed texts, returning vectors in input order"""
+        start = time.perf_counter()
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            results = list(pool.map(self._embed_batch, batches))
+        vectors = [vector for batch_vectors in results for vector in batch_vectors]
+
+        seconds = time.perf_counter() - start
+        self.last_stats = {
+            "chunks": len(texts),
+            "batches": len(batches),
+            "seconds": seconds,
+            "chunks_per_second": len(texts) / seconds if seconds else 0.0
+        }
+        print(f"Embedded {len(texts)} chunks in {len(batches)} batches, {seconds:.2f}s "
+              f"({self.last_stats['chunks_per_second']:.1f} chunks/s)")
+        return vectors
+
+
+class FakeEmbeddingProvider:
+    """Offline stand-in for a remote embedding API with configurable latency and failure rate"""
+
+    def __init__(self, dim=768, latency=0.05, failure_rate=0.0, seed=0):
+        self.dim = dim
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency)
+        with self._lock:
+            if self._random.random() < self.failure_rate:
+                raise Exception("simulated transient API error")
+        vectors = []
+        for text in texts:
+            text_random = random.Random(text)
+            vectors.append([text_random.random() for _ in range(self.dim)])
+        return vectors
+
+
+if __name__ == "__main__":
+    provider = FakeEmbeddingProvider(dim=64, latency=0.05, failure_rate=0.1)
+    chunks = [f"chunk {i}" for i in range(2000)]
+    for workers in (1, 4, 8):
+        pipeline = EmbeddingPipeline(provider.embed_documents, batch_size=50, max_workers=workers,
+                                     requests_per_minute=0, backoff_seconds=0.01)
+        pipeline.embed_documents(chunks)
@@ -0,0 +1,79 @@
+import os
+import re
+import zlib
+from functools import lru_cache
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "google")
+GOOGLE_EMBEDDING_MODEL = os.getenv("GOOGLE_EMBEDDING_MODEL", "models/embedding-001")
+HASHING_EMBEDDING_DIM = int(os.getenv("HASHING_EMBEDDING_DIM", "1024"))
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+@lru_cache(maxsize=100000)
+def _token_slots(token, dim, min_n, max_n):
+    """Buckets and signs of a word and its character n-grams; crc32 keeps them stable across processes"""
+    padded = f"<{token}>"
+    features = [token]
+    for n in range(min_n, max_n + 1):
+        features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+    slots = np.empty(len(features), dtype=np.int64)
+    signs = np.empty(len(features), dtype=np.float32)
+    for i, feature in enumerate(features):
+        hashed = zlib.crc32(feature.encode("utf-8"))
+        slots[i] = hashed % dim
+        signs[i] = 1.0 if hashed & 0x80000000 else -1.0
+    return slots, signs
+
+
+class HashingEmbeddings(Embeddings):
+    """Local CPU embeddings: hashed word and character n-gram counts, log scaled and L2 normalised.
+    Needs no network or model download, so it suits offline serving and tests."""
+
+    def __init__(self, dim=HASHING_EMBEDDING_DIM, ngram_range=(3, 5)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.model = f"hashing-{dim}-char{ngram_range[0]}{ngram_range[1]}"
+
+    def _embed(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        min_n, max_n = self.ngram_range
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            slots, signs = _token_slots(token, self.dim, min_n, max_n)
+            np.add.at(vector, slots, signs)
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector
+
+    def embed_documents(self, texts):
+        return [self._embed(text).tolist() for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text).tolist()
+
+
+def _google_embeddings():
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    return GoogleGenerativeAIEmbeddings(model=GOOGLE_EMBEDDING_MODEL)
+
+
+EMBEDDING_PROVIDERS = {
+    "google": _google_embeddings,
+    "hashing": HashingEmbeddings,
+}
+
+
+def get_embedding_provider(name=None):
+    """Create the embeddings selected by name or by the EMBEDDING_PROVIDER setting.
+    Every provider exposes its model name as .model so caches and index keys stay separate."""
+    name = (name or EMBEDDING_PROVIDER).lower()
+    if name not in EMBEDDING_PROVIDERS:
+        raise ValueError(f"Unknown embedding provider '{name}'. "
+                         f"Choose one of: {', '.join(EMBEDDING_PROVIDERS)}")
+    return EMBEDDING_PROVIDERS[name]()
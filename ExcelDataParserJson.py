@@ -1,10 +1,17 @@
+import multiprocessing
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
 import xlrd
 import json
 from datetime import datetime
 import re
 from pathlib import Path
+
+from RecordFiles import RECORD_EXTENSIONS, RECORD_FORMAT, RecordWriter, iter_records
+from WorkbookReader import iter_workbook_sheets, workbook_sheet_names
 import xlrd
 import json
 from datetime import datetime
@@ -18,162 +25,50 @@ def get_merged_cells(sheet):
 
 
 def is_merged_cell(merged_cells, row_idx, col_idx):
-    """Check if a cell is part of a merged range"""
+    """Check if a cell is part of a merged range; merged_cells is a MergedCellIndex
+    or the range list from get_merged_cells"""
+    if isinstance(merged_cells, MergedCellIndex):
+        return merged_cells.anchor(row_idx, col_idx)
     for rlo, rhi, clo, chi in merged_cells:
         if rlo <= row_idx < rhi and clo <= col_idx < chi:
             return (rlo, clo)  # Return top-left cell of merged range
     return None
 
 
-def extract_section_classroom(cell_value):
-    """Extract section (between 'Section :-' and 'CLASSROOM:')
-       and classroom (after 'CLASSROOM:')"""
-    text = str(cell_value)
-    section = classroom = ""
-
-    section_marker = "Section :-"
-    classroom_marker = "CLASSROOM:"
-
-    section_start = text.find(section_marker)
-    classroom_start = text.find(classroom_marker)
-
-    if section_start != -1 and classroom_start != -1:
-        section = text[section_start + len(section_marker):classroom_start].strip()
-        classroom = text[classroom_start + len(classroom_marker):].strip()
-    elif section_start != -1:
-        section = text[section_start + len(section_marker):].strip()
-    elif classroom_start != -1:
-        classroom = text[classroom_start + len(classroom_marker):].strip()
-
-    section = re.sub(r'[^a-zA-Z0-9]', '', section)
-    classroom = classroom.split()[0] if classroom else ""
-
-    return section, classroom
-
-
-def parse_timetable_sheet(sheet):
-    timetable_data = []
-    info_row_indexes = [4, 35, 69, 103, 136]  # 0-based for rows 5,36,70,104,137
-    current_semester = current_section = current_classroom = ""
-    merged_cells = get_merged_cells(sheet)
-
-    for row_idx in range(sheet.nrows):
-        # Check if this is an info row
-        if row_idx in info_row_indexes:
-            semester_cell = get_merged_cell_value(sheet, row_idx, 1)
-            current_semester = str(semester_cell).replace("Semester :-", "").strip()
-
-            section_classroom_cell = get_merged_cell_value(sheet, row_idx, 5)
-            current_section, current_classroom = extract_section_classroom(section_classroom_cell)
-            continue
+class MergedCellIndex:
+    """Merged ranges of one sheet keyed by every cell they cover, built once per sheet, so anchor,
+    span and value lookups are O(1) instead of a scan over sheet.merged_cells for every cell"""
 
-        # Process timetable rows (Monday to Friday)
-        day = str(sheet.cell_value(row_idx, 0)).strip()
-        if day in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]:
-            time_slots = {
-                2: "09:00-10:00", 3: "10:00-11:00", 4: "11:00-12:00",
-                5: "12:00-1:00", 6: "1:00-2:00", 7: "2:00-3:00",
-                8: "3:00-4:00", 9: "4:00-5:00"
-            }
-
-            for col_idx, time_slot in time_slots.items():
-                if col_idx >= sheet.ncols:
-                    continue
-
-                # Check if this cell is merged
-                merged_info = is_merged_cell(merged_cells, row_idx, col_idx)
-                if merged_info:
-                    merged_rlo, merged_clo = merged_info
-                    # Only process if we're at the top-left cell of the merged range
-                    if row_idx != merged_rlo or col_idx != merged_clo:
-                        continue
-
-                    # Get the merged cell value
-                    cell_value = sheet.cell_value(merged_rlo, merged_clo)
-
-                    # Calculate how many periods this spans (width of merged columns)
-                    merged_width = 1
-                    for rlo, rhi, clo, chi in merged_cells:
-                        if rlo == merged_rlo and clo == merged_clo:
-                            merged_width = chi - clo
-                            break
-
-                    # Create entries for each time slot in the merged range
-                    for i in range(merged_width):
-                        current_col = col_idx + i
-                        if current_col in time_slots:
-                            current_time = time_slots[current_col]
-
-                            if not cell_value or str(cell_value).strip().upper() == "RECESS":
-                                continue
-
-                            parts = [p.strip() for p in str(cell_value).split("\n") if p.strip()]
-                            subject_abbr = parts[0].split(":")[0].strip() if ":" in parts[0] else parts[0]
-
-                            faculty = ""
-                            room = current_classroom
-
-                            if len(parts) > 1 and "(" in parts[1]:
-                                faculty = parts[1].strip("()")
-                            elif len(parts) > 1:
-                                faculty = parts[1]
-
-                            if len(parts) > 2:
-                                room = parts[2]
-
-                            timetable_data.append({
-                                "semester": current_semester,
-                                "section": current_section,
-                                "classroom": room,
-                                "day": day,
-                                "time": current_time,
-                                "period": current_col - 2,
-                                "subject": subject_abbr,
-                                "faculty": faculty,
-                                "room": room
-                            })
-                else:
-                    # Normal (non-merged) cell processing
-                    cell_value = sheet.cell_value(row_idx, col_idx)
-                    if not cell_value or str(cell_value).strip().upper() == "RECESS":
-                        continue
+    def __init__(self, sheet):
+        self.sheet = sheet
+        self.ranges = {}
+        for rlo, rhi, clo, chi in sheet.merged_cells:
+            merged_range = (rlo, rhi, clo, chi)
+            for row_idx in range(rlo, rhi):
+                for col_idx in range(clo, chi):
+                    self.ranges.setdefault((row_idx, col_idx), merged_range)
 
-                    parts = [p.strip() for p in str(cell_value).split("\n") if p.strip()]
-                    subject_abbr = parts[0].split(":")[0].strip() if ":" in parts[0] else parts[0]
+    def span(self, row_idx, col_idx):
+        """(rlo, rhi, clo, chi) of the merged range covering the cell, or None"""
+        return self.ranges.get((row_idx, col_idx))
 
-                    faculty = ""
-                    room = current_classroom
+    def anchor(self, row_idx, col_idx):
+        """Top-left cell of the merged range covering the cell, or None"""
+        merged_range = self.ranges.get((row_idx, col_idx))
+        return (merged_range[0], merged_range[2]) if merged_range else None
 
-                    if len(parts) > 1 and "(" in parts[1]:
-                        faculty = parts[1].strip("()")
-                    elif len(parts) > 1:
-                        faculty = parts[1]
+    def value(self, row_idx, col_idx):
+        """Cell value, taken from the top-left cell when the cell is merged"""
+        merged_range = self.ranges.get((row_idx, col_idx))
+        if merged_range:
+            return self.sheet.cell_value(merged_range[0], merged_range[2])
+        return self.sheet.cell_value(row_idx, col_idx)
 
-                    if len(parts) > 2:
-                        room = parts[2]
 
-                    timetable_data.append({
-                        "semester": current_semester,
-                        "section": current_section,
-                        "classroom": room,
-                        "day": day,
-                        "time": time_slot,
-                        "period": col_idx - 2,
-                        "subject": subject_abbr,
-                        "faculty": faculty,
-                        "room": room
-                    })
-
-    return timetable_data
-
-
-# [Rest of the code remains the same as previous implementation]
-# parse_subjects_section(), parse_excel_file(), and main() functions
-# stay exactly the same as in the previous complete solution
-
-
-def get_merged_cell_value(sheet, row_idx, col_idx):
+def get_merged_cell_value(sheet, row_idx, col_idx, merged_index=None):
     """Get value from merged cell"""
+    if merged_index is not None:
+        return merged_index.value(row_idx, col_idx)
     for merged in sheet.merged_cells:
         if merged[0] <= row_idx < merged[1] and merged[2] <= col_idx < merged[3]:
             return sheet.cell_value(merged[0], merged[2])
@@ -212,181 +107,318 @@ def extract_section_classroom(cell_value):
     return section, classroom
 
 
-def parse_timetable_sheet(sheet):
-    timetable_data = []
-    # 0-based indexes for rows 5,36,70,104,137
-    info_row_indexes = [4, 35, 69, 103, 136]
+# Time slots mapping to columns (0-based index); column G (6) is the recess
+TIME_SLOTS = {
+    2: "09:00-10:00",  # Column C
+    3: "10:00-11:00",  # Column D
+    4: "11:00-12:00",  # Column E
+    5: "12:00-1:00",  # Column F
+    6: "1:00-2:00",  # Column G (Recess)
+    7: "2:00-3:00",  # Column H
+    8: "3:00-4:00",  # Column I
+    9: "4:00-5:00"  # Column J
+}
+TIMETABLE_DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+SEMESTER_HEADER_PATTERN = re.compile(r'^\s*Semester\s*:-?', re.IGNORECASE)
+
+
+def semester_header(merged_index, row_idx):
+    """Semester of a semester/section header row (merged columns B-E), or None for any other row"""
+    text = str(merged_index.value(row_idx, 1))
+    if not SEMESTER_HEADER_PATTERN.match(text):
+        return None
+    return SEMESTER_HEADER_PATTERN.sub("", text).strip()
+
+
+def lecture_record(cell_value, day, col_idx, semester, section, classroom):
+    # Parse subject, faculty, and room
+    parts = [p.strip() for p in str(cell_value).split("\n") if p.strip()]
+    subject_abbr = parts[0].split(":")[0].strip() if ":" in parts[0] else parts[0]
+
+    faculty = ""
+    room = classroom
+
+    if len(parts) > 1 and "(" in parts[1]:
+        faculty = parts[1].strip("()")
+    elif len(parts) > 1:
+        faculty = parts[1]
+
+    if len(parts) > 2:
+        room = parts[2]
+
+    return {
+        "semester": semester.strip(),
+        "section": section.strip(),
+        "classroom": room.strip(),
+        "day": day.strip(),
+        "time": TIME_SLOTS[col_idx].strip(),
+        "period": col_idx - 2,  # 0-based period index
+        "subject": subject_abbr.strip(),
+        "faculty": faculty.strip(),
+        "room": room.strip()
+    }
+
+
+def subject_record(row, current_type):
+    """Subject from a row of the THEORY SUBJECT / PRACTICAL table, or None for a non-subject row"""
+    course_code = ""
+    subject_abbr = ""
+    faculty_name = ""
+    faculty_abbr = ""
+
+    # Course code (merged columns A and B)
+    if row[0] and row[1]:
+        course_code = f"{row[0]}: {row[1]}" if row[1] else str(row[0])
+    elif row[0]:
+        course_code = str(row[0])
+
+    # Subject abbreviation (column D)
+    if len(row) > 3 and row[3]:
+        subject_abbr = str(row[3])
+
+    # Faculty name (column E)
+    if len(row) > 4 and row[4]:
+        faculty_name = str(row[4])
+
+    # Faculty abbreviation (column F)
+    if len(row) > 5 and row[5]:
+        faculty_abbr = str(row[5])
+
+    # For practicals (merged columns G, H, I)
+    if current_type == "practical" and len(row) > 6:
+        supporting_staff = []
+        if row[6] and row[7] and row[8]:
+            supporting_staff = [str(row[6]), str(row[7]), str(row[8])]
+        elif row[6] and row[7]:
+            supporting_staff = [str(row[6]), str(row[7])]
+        elif row[6]:
+            supporting_staff = [str(row[6])]
+
+        if supporting_staff:
+            faculty_name += " (" + ", ".join(supporting_staff) + ")"
+
+    if not (course_code and subject_abbr):
+        return None
+    return {
+        "course_code": course_code.strip(),
+        "subject_abbreviation": subject_abbr.strip(),
+        "subject_type": current_type.strip(),
+        "faculty_name": faculty_name.strip(),
+        "faculty_abbreviation": faculty_abbr.strip()
+    }
+
+
+def iter_sheet_records(sheet, merged_index=None):
+    """Single pass over a sheet's rows yielding ("timetable", lecture) and ("subjects", subject)
+    records as they are read. Semester/section header rows are recognised by their "Semester :-"
+    cell on the way, instead of sitting at fixed row numbers."""
+    merged_index = merged_index or MergedCellIndex(sheet)
     current_semester = current_section = current_classroom = ""
-
-    for row_idx in range(sheet.nrows):
-        # Check if this is an info row
-        if row_idx in info_row_indexes:
-            # Get semester from merged columns B-E (indexes 1-4)
-            semester_cell = get_merged_cell_value(sheet, row_idx, 1)
-            current_semester = str(semester_cell).replace("Semester :-", "").strip()
-
-            # Get section and classroom from merged columns F-H (indexes 5-7)
-            section_classroom_cell = get_merged_cell_value(sheet, row_idx, 5)
-            current_section, current_classroom = extract_section_classroom(section_classroom_cell)
-            continue
-
-        # Process timetable rows (Monday to Friday)
-        day = str(sheet.cell_value(row_idx, 0)).strip()
-        if day in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]:
-            # Time slots mapping to columns (0-based index)
-            time_slots = {
-                2: "09:00-10:00",  # Column C
-                3: "10:00-11:00",  # Column D
-                4: "11:00-12:00",  # Column E
-                5: "12:00-1:00",  # Column F
-                6: "1:00-2:00",  # Column G (Recess)
-                7: "2:00-3:00",  # Column H
-                8: "3:00-4:00",  # Column I
-                9: "4:00-5:00"  # Column J
-            }
-
-            for col_idx, time_slot in time_slots.items():
-                if col_idx >= sheet.ncols:  # Skip if column doesn't exist
-                    continue
-
-                cell_value = get_merged_cell_value(sheet, row_idx, col_idx)
-                if not cell_value or str(cell_value).strip().upper() == "RECESS":
-                    continue
-
-                # Parse subject, faculty, and room
-                parts = [p.strip() for p in str(cell_value).split("\n") if p.strip()]
-                subject_abbr = parts[0].split(":")[0].strip() if ":" in parts[0] else parts[0]
-
-                faculty = ""
-                room = current_classroom
-
-                if len(parts) > 1 and "(" in parts[1]:
-                    faculty = parts[1].strip("()")
-                elif len(parts) > 1:
-                    faculty = parts[1]
-
-                if len(parts) > 2:
-                    room = parts[2]
-
-                timetable_data.append({
-                    "semester": current_semester.strip(),
-                    "section": current_section.strip(),
-                    "classroom": room.strip(),
-                    "day": day.strip(),
-                    "time": time_slot.strip(),
-                    "period": col_idx - 2,  # 0-based period index
-                    "subject": subject_abbr.strip(),
-                    "faculty": faculty.strip(),
-                    "room": room.strip()
-                })
-
-    return timetable_data
-
-
-def parse_subjects_section(sheet):
-    subject_data = []
     current_type = None
 
-    # Find the THEORY SUBJECT/PRACTICAL section
-    found_section = False
     for row_idx in range(sheet.nrows):
-        row = [get_merged_cell_value(sheet, row_idx, col) for col in range(sheet.ncols)]
-        if not any(row):  # Skip empty rows
-            continue
+        semester = semester_header(merged_index, row_idx)
+        if semester is not None:
+            current_semester = semester
+            # Section and classroom from merged columns F-H (indexes 5-7)
+            current_section, current_classroom = extract_section_classroom(merged_index.value(row_idx, 5))
+        else:
+            # Process timetable rows (Monday to Friday)
+            day = str(sheet.cell_value(row_idx, 0)).strip()
+            if day in TIMETABLE_DAYS:
+                for col_idx in TIME_SLOTS:
+                    if col_idx >= sheet.ncols:  # Skip if column doesn't exist
+                        continue
+                    cell_value = merged_index.value(row_idx, col_idx)
+                    if not cell_value or str(cell_value).strip().upper() == "RECESS":
+                        continue
+                    yield "timetable", lecture_record(cell_value, day, col_idx, current_semester,
+                                                      current_section, current_classroom)
 
-        # Check for section headers
-        if row[0] and "THEORY SUBJECT" in str(row[0]):
+        # The subjects table follows the timetable blocks; its section headers switch the type
+        first_cell = merged_index.value(row_idx, 0)
+        if first_cell and "THEORY SUBJECT" in str(first_cell):
             current_type = "theory"
-            found_section = True
             continue
-        elif row[0] and "PRACTICAL" in str(row[0]):
+        elif first_cell and "PRACTICAL" in str(first_cell):
             current_type = "practical"
-            found_section = True
             continue
 
-        if not found_section:
+        # Skip rows before the subjects table and non-data rows
+        if current_type is None or not first_cell or "Course code:" in str(first_cell):
             continue
 
-        # Skip non-data rows
-        if not row[0] or "Course code:" in str(row[0]):
-            continue
+        subject = subject_record([merged_index.value(row_idx, col) for col in range(sheet.ncols)], current_type)
+        if subject:
+            yield "subjects", subject
 
-        # Parse subject information
-        course_code = ""
-        subject_abbr = ""
-        faculty_name = ""
-        faculty_abbr = ""
-
-        # Course code (merged columns A and B)
-        if row[0] and row[1]:
-            course_code = f"{row[0]}: {row[1]}" if row[1] else str(row[0])
-        elif row[0]:
-            course_code = str(row[0])
-
-        # Subject abbreviation (column D)
-        if len(row) > 3 and row[3]:
-            subject_abbr = str(row[3])
-
-        # Faculty name (column E)
-        if len(row) > 4 and row[4]:
-            faculty_name = str(row[4])
-
-        # Faculty abbreviation (column F)
-        if len(row) > 5 and row[5]:
-            faculty_abbr = str(row[5])
-
-        # For practicals (merged columns G, H, I)
-        if current_type == "practical" and len(row) > 6:
-            supporting_staff = []
-            if row[6] and row[7] and row[8]:
-                supporting_staff = [str(row[6]), str(row[7]), str(row[8])]
-            elif row[6] and row[7]:
-                supporting_staff = [str(row[6]), str(row[7])]
-            elif row[6]:
-                supporting_staff = [str(row[6])]
-
-            if supporting_staff:
-                faculty_name += " (" + ", ".join(supporting_staff) + ")"
-
-        if course_code and subject_abbr:
-            subject_data.append({
-                "course_code": course_code.strip(),
-                "subject_abbreviation": subject_abbr.strip(),
-                "subject_type": current_type.strip(),
-                "faculty_name": faculty_name.strip(),
-                "faculty_abbreviation": faculty_abbr.strip()
-            })
-
-    return subject_data
-
-
-def parse_excel_file(file_path):
-    try:
-        workbook = xlrd.open_workbook(file_path)
-        all_timetable_data = []
-        all_subject_data = []
 
-        for sheet_name in workbook.sheet_names():
-            sheet = workbook.sheet_by_name(sheet_name)
+def parse_timetable_sheet(sheet, merged_index=None):
+    return [record for kind, record in iter_sheet_records(sheet, merged_index) if kind == "timetable"]
+
 
-            # Parse timetable data from each sheet
-            timetable_data = parse_timetable_sheet(sheet)
-            all_timetable_data.extend(timetable_data)
+def parse_subjects_section(sheet, merged_index=None):
+    return [record for kind, record in iter_sheet_records(sheet, merged_index) if kind == "subjects"]
 
-            # Parse subject data from each sheet
-            subject_data = parse_subjects_section(sheet)
-            all_subject_data.extend(subject_data)
 
-        return {
-            "timetable": all_timetable_data,
-            "subjects": all_subject_data
-        }
+# Parser pools are called from Streamlit's and the JobRunner's threads; a forked child can inherit a
+# lock another thread held at fork time and hang, so workers are started fresh with spawn
+POOL_CONTEXT = multiprocessing.get_context("spawn")
+# Default cap on parser processes; each one imports the parser and opens its own workbook
+MAX_DEFAULT_WORKERS = 4
+# Worker processes for the sheets of one workbook; 1 parses them serially in the calling process
+SHEET_WORKERS = int(os.getenv("SHEET_WORKERS", str(min(os.cpu_count() or 1, MAX_DEFAULT_WORKERS))))
+# Below this size starting the workers costs more than the sheets take to parse, so by default
+# smaller workbooks are parsed serially; an explicit sheet_workers always applies
+PARALLEL_SHEETS_MIN_BYTES = int(os.getenv("PARALLEL_SHEETS_MIN_BYTES", str(4 * 2 ** 20)))
+
+
+def parse_sheet(file_path, sheet_name):
+    """Records of one sheet, for a worker process that opens the workbook itself"""
+    return [record for sheet in iter_workbook_sheets(file_path, [sheet_name])
+            for record in iter_sheet_records(sheet, MergedCellIndex(sheet))]
+
+
+def iter_excel_records(file_path, sheet_workers=None):
+    """(kind, record) pairs of every sheet of a .xls or .xlsx workbook in sheet order. Serially, records
+    are produced lazily with only one sheet loaded at a time; with several sheet_workers the sheets are
+    parsed concurrently in worker processes and their records are yielded in sheet order. By default only
+    workbooks of at least PARALLEL_SHEETS_MIN_BYTES use SHEET_WORKERS."""
+    if sheet_workers is None:
+        sheet_workers = SHEET_WORKERS if os.path.getsize(file_path) >= PARALLEL_SHEETS_MIN_BYTES else 1
+    try:
+        sheet_names = workbook_sheet_names(file_path) if sheet_workers > 1 else []
+        if len(sheet_names) > 1:
+            with ProcessPoolExecutor(max_workers=min(sheet_workers, len(sheet_names)),
+                                     mp_context=POOL_CONTEXT) as pool:
+                # map returns results in submission order, so the output does not depend on timing
+                for records in pool.map(partial(parse_sheet, file_path), sheet_names):
+                    yield from records
+            return
+
+        for sheet in iter_workbook_sheets(file_path):
+            yield from iter_sheet_records(sheet, MergedCellIndex(sheet))
     except xlrd.XLRDError as e:
         raise Exception(f"Excel file parsing error: {str(e)}")
     except Exception as e:
         raise Exception(f"Error processing file: {str(e)}")
 
 
+def parse_excel_file(file_path, sheet_workers=None):
+    result = {"timetable": [], "subjects": []}
+    for kind, record in iter_excel_records(file_path, sheet_workers):
+        result[kind].append(record)
+    return result
+
+
+def write_records(records, output_dir=".", record_format=RECORD_FORMAT):
+    """Stream (kind, record) pairs into timetable_<timestamp> and subjects_<timestamp> record files
+    (schema-versioned JSON Lines or Parquet), so no list of the workbook's records is ever built"""
+    # Microseconds keep concurrent jobs apart
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    output_files = {}
+    for kind in ("timetable", "subjects"):
+        filename = f"{kind}_{timestamp}{RECORD_EXTENSIONS[record_format]}"
+        output_files[kind] = {"filename": filename, "filepath": os.path.abspath(os.path.join(output_dir, filename)),
+                              "count": 0}
+
+    writers = {kind: RecordWriter(info["filepath"], kind, record_format) for kind, info in output_files.items()}
+    try:
+        for kind, record in records:
+            writers[kind].write(record)
+    except Exception:
+        for writer in writers.values():
+            writer.abort()
+        raise
+    for kind, writer in writers.items():
+        writer.close()
+        output_files[kind]["count"] = writer.count
+
+    print(f"Saved {output_files['timetable']['count']} timetable records to {output_files['timetable']['filename']} "
+          f"and {output_files['subjects']['count']} subjects to {output_files['subjects']['filename']}")
+    return output_files
+
+
+def merge_record_files(output_files_list, output_dir=".", labels=None):
+    """Concatenate parsed record files record by record, de-duplicating subjects shared between workbooks.
+    labels optionally gives, per record file pair, fields (department, term) set on each of its records."""
+    labels = labels or [{}] * len(output_files_list)
+
+    def records():
+        seen_subjects = set()
+        for output_files, label in zip(output_files_list, labels):
+            for record in iter_records(output_files["timetable"]["filepath"]):
+                yield "timetable", {**record, **label}
+            for record in iter_records(output_files["subjects"]["filepath"]):
+                record = {**record, **label}
+                key = json.dumps(record, sort_keys=True)
+                if key not in seen_subjects:
+                    seen_subjects.add(key)
+                    yield "subjects", record
+
+    return write_records(records(), output_dir)
+
+
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(min(os.cpu_count() or 1, MAX_DEFAULT_WORKERS))))
+
+
+def timed_parse_excel_file(file_path, output_dir=".", sheet_workers=None):
+    """Streams one workbook to record files, possibly in a worker process: (file_path, output_files or None,
+    seconds, error or None); only file names cross the process boundary, not the records"""
+    start = time.perf_counter()
+    try:
+        output_files = write_records(iter_excel_records(file_path, sheet_workers), output_dir)
+        return file_path, output_files, time.perf_counter() - start, None
+    except Exception as e:
+        return file_path, None, time.perf_counter() - start, str(e)
+
+
+def parse_excel_files(file_paths, max_workers=PARSE_WORKERS, output_dirs=None):
+    """Parse workbooks concurrently in a process pool. A failing workbook does not stop the batch;
+    returns ({file_path: output_files} for the parsed ones, [per-file report] in input order).
+    output_dirs optionally maps a file path to the directory its record files are written to."""
+    file_paths = list(file_paths)
+    output_dirs = [(output_dirs or {}).get(file_path, ".") for file_path in file_paths]
+    workers = max(1, min(max_workers, len(file_paths)))
+    if workers == 1:
+        # A lone large workbook spreads its sheets over worker processes instead
+        outcomes = [timed_parse_excel_file(file_path, output_dir=output_dir)
+                    for file_path, output_dir in zip(file_paths, output_dirs)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=POOL_CONTEXT) as pool:
+            outcomes = list(pool.map(partial(timed_parse_excel_file, sheet_workers=1), file_paths,
+                                     output_dirs))
+
+    results = {}
+    reports = []
+    for file_path, output_files, seconds, error in outcomes:
+        report = {"file": os.path.basename(file_path), "seconds": round(seconds, 3),
+                  "timetable": 0, "subjects": 0, "error": error}
+        if output_files is not None:
+            results[file_path] = output_files
+            report["timetable"] = output_files["timetable"]["count"]
+            report["subjects"] = output_files["subjects"]["count"]
+        print(f"Parsed {report['file']} in {seconds:.2f}s" + (f" - failed: {error}" if error else ""))
+        reports.append(report)
+    return results, reports
+
+
+def infer_source_metadata(file_name):
+    """Guess department and academic term from a timetable file name such as
+       'UG CLASS CTECH TT_odd (24-25)_ 3RD-5TH-7TH SEM...xls'"""
+    department = term = ""
+
+    department_match = re.search(r'\bCLASS\s+([A-Za-z]+)', file_name)
+    if department_match:
+        department = department_match.group(1).upper()
+
+    term_match = re.search(r'(?<![a-z])(odd|even)\s*\((\d{2}-\d{2})\)', file_name, re.IGNORECASE)
+    if term_match:
+        term = f"{term_match.group(1).lower()} {term_match.group(2)}"
+
+    return {"department": department, "term": term}
+
+
 def save_uploaded_file(uploaded_file, save_dir="uploaded_files"):
     """Save uploaded file to disk and return the file path"""
     try:
@@ -413,40 +445,10 @@ def excelToJsonConverter(filepath):
         input_file = filepath
     try:
         print(f"Processing {input_file}...")
-        result = parse_excel_file(input_file)
-
-        # Generate timestamp for output files
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-
-        # Prepare output dictionary
-        output_files = {
-            "timetable": {
-                "filename": f"timetable_{timestamp}.json",
-                "filepath": os.path.abspath(f"timetable_{timestamp}.json")
-            },
-            "subjects": {
-                "filename": f"subjects_{timestamp}.json",
-                "filepath": os.path.abspath(f"subjects_{timestamp}.json")
-            }
-        }
-
-        # Save timetable data
-        timetable_output = f"timetable_{timestamp}.json"
-        with open(timetable_output, 'w', encoding='utf-8') as f:
-            json.dump(result["timetable"], f, indent=2, ensure_ascii=False)
-        print(f"Timetable data saved to {timetable_output}")
-
-        # Save subject data
-        subjects_output = f"subjects_{timestamp}.json"
-        with open(subjects_output, 'w', encoding='utf-8') as f:
-            json.dump(result["subjects"], f, indent=2, ensure_ascii=False)
-        print(f"Subject data saved to {subjects_output}")
-
+        # Records go from the sheet rows straight to the record files
+        output_files = write_records(iter_excel_records(input_file))
         print("Processing completed successfully!")
-
         return output_files
-
-
     except Exception as e:
         print(f"Error: {str(e)}")
         print("Make sure you have xlrd installed (pip install xlrd)")
@@ -0,0 +1,386 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.documents import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+import ExcelDataParserJson
+import RecordFiles
+import TimetableChunker
+import VectorStoreManager
+from ArtifactStore import artifact_store, combined_key, file_hash
+from JsonToTextFile import TimetableProcessor
+
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "2"))
+JOBS_DB_PATH = "ingestion_jobs.sqlite"
+CHUNK_SIZE = 10000
+CHUNK_OVERLAP = 1000
+# Build parameters saved next to each index, so a later build knows whether it can update it in place
+INDEX_PARAMS_NAME = "index_params.json"
+# Bump when the parser's records change, so workbooks parsed by an older version are parsed again
+PARSE_CACHE_VERSION = 1
+
+
+class TimetableIndexer:
+    """Chunks, embeds and indexes timetable sources into the shard of their department/term.
+    It holds no Streamlit state, so it runs the same on a script rerun or a background job thread."""
+
+    def __init__(self, embeddings, embedding_cache, embedding_pipeline, registry=None, index_config=None):
+        self.embeddings = embeddings
+        self.embedding_cache = embedding_cache
+        self.embedding_pipeline = embedding_pipeline
+        self.registry = registry or VectorStoreManager.shard_registry
+        self.index_config = index_config or VectorStoreManager.INDEX_CONFIG
+
+    def index_params(self, source_metadata):
+        """Everything besides the chunks that changes what ends up in the index"""
+        return {"embedding_model": self.embeddings.model,
+                "index": VectorStoreManager.index_build_params(self.index_config),
+                "source": source_metadata}
+
+    def load_documents(self, source_paths, source_metadata):
+        """Record-aligned chunks from parsed timetable JSON, or split chunks from a plain text file"""
+        if len(source_paths) == 2:
+            processor = TimetableProcessor()
+            processor.load_json(*source_paths)
+            return TimetableChunker.chunk_timetable(processor, source_metadata)
+
+        with open(source_paths[0], encoding='utf-8') as f:
+            raw_text = f.read()
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        return [Document(page_content=chunk) for chunk in text_splitter.split_text(raw_text)]
+
+    def embed(self, documents):
+        texts = [document.page_content for document in documents]
+        # Only chunks that were never embedded with this model go to the API
+        return self.embedding_cache.embed_documents(texts, self.embeddings.model,
+                                                    self.embedding_pipeline.embed_documents)
+
+    def previous_store(self, previous_folder, params):
+        """The shard's last published index when it was built with the same params, loaded anew rather
+        than taken from the retriever cache since that copy keeps serving searches while this one changes"""
+        try:
+            with open(os.path.join(previous_folder, INDEX_PARAMS_NAME), encoding='utf-8') as f:
+                if json.load(f) != params:
+                    return None
+        except FileNotFoundError:
+            return None
+        return VectorStoreManager.PartitionedStore.load_local(previous_folder, self.embeddings)
+
+    def build(self, documents, folder_name, params=None, previous_folder=None):
+        """Index documents into folder_name. Given the shard's previous index, only the chunks whose
+        day/semester/section block (or subject) changed are embedded and added, and the ones that are
+        gone are deleted by chunk_id; otherwise one sub-index is built per department/term/semester."""
+        store = self.previous_store(previous_folder, params) if previous_folder else None
+        changes = store.diff(documents) if store is not None else None
+        if changes is None:
+            store = VectorStoreManager.PartitionedStore.from_embeddings(documents, self.embed(documents),
+                                                                        self.embeddings, self.index_config)
+        else:
+            removed_ids, added = changes
+            print(f"Updating index from {previous_folder}: {len(removed_ids)} chunks removed, {len(added)} added")
+            store.apply_changes(removed_ids, added, self.embed(added), self.embed, self.index_config)
+        store.save_local(folder_name)
+        if params is not None:
+            with open(os.path.join(folder_name, INDEX_PARAMS_NAME), 'w', encoding='utf-8') as f:
+                json.dump(params, f, sort_keys=True)
+
+    def index_folder(self, source_paths, source_metadata=None, shard=None):
+        """Index folder matching the current content of the sources, built on first use (as an update of
+        the shard's current index where possible) and published as the given shard, or else the shard
+        of the source's department/term or file names"""
+        source_metadata = {key: value for key, value in (source_metadata or {}).items() if value}
+        shard = shard or VectorStoreManager.shard_name(source_metadata, source_paths)
+        params = self.index_params(source_metadata)
+        previous_folder = self.registry.shards().get(shard, {}).get("folder")
+        folder = self.registry.manager(shard).folder_for_sources(
+            source_paths, params, lambda paths: self.load_documents(paths, source_metadata),
+            lambda documents, staging_folder: self.build(documents, staging_folder, params, previous_folder))
+        if folder:
+            self.registry.publish(shard, folder, source_metadata)
+        return folder
+
+
+class JobStore:
+    """Ingestion job status in SQLite, so every worker process sees it and it survives restarts"""
+
+    def __init__(self, path=JOBS_DB_PATH):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                status TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                progress REAL NOT NULL,
+                result TEXT,
+                error TEXT,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+        """)
+
+    def create(self, name):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT INTO jobs VALUES (?, ?, 'queued', 'queued', 0, NULL, NULL, ?, ?)",
+                             (job_id, name, now, now))
+        return job_id
+
+    def update(self, job_id, **fields):
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"])
+        fields["updated"] = time.time()
+        assignments = ", ".join(f"{field} = ?" for field in fields)
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", [*fields.values(), job_id])
+
+    def _row_to_job(self, cursor, row):
+        job = dict(zip([column[0] for column in cursor.description], row))
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            cursor = self._db.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,))
+            row = cursor.fetchone()
+        return self._row_to_job(cursor, row) if row else None
+
+    def recent(self, limit=10):
+        with self._lock:
+            cursor = self._db.execute("SELECT * FROM jobs ORDER BY created DESC LIMIT ?", (limit,))
+            rows = cursor.fetchall()
+        return [self._row_to_job(cursor, row) for row in rows]
+
+
+class JobRunner:
+    """Runs job functions on a small worker pool, recording stage, progress and outcome in a JobStore.
+    A job function is called as fn(report, *args), where report(stage, progress) updates its status,
+    and returns a JSON-serialisable result."""
+
+    def __init__(self, store, max_workers=INGESTION_WORKERS):
+        self.store = store
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+
+    def submit(self, name, fn, *args):
+        job_id = self.store.create(name)
+        self.pool.submit(self._run, job_id, fn, args)
+        return job_id
+
+    def _run(self, job_id, fn, args):
+        def report(stage, progress):
+            self.store.update(job_id, status="running", stage=stage, progress=progress)
+
+        start = time.perf_counter()
+        try:
+            result = fn(report, *args)
+        except Exception as e:
+            print(f"Ingestion job {job_id} failed: {e}")
+            self.store.update(job_id, status="failed", error=str(e))
+            return
+        print(f"Ingestion job {job_id} finished in {time.perf_counter() - start:.2f}s")
+        self.store.update(job_id, status="done", stage="done", progress=1.0, result=result)
+
+
+def write_structured_text(timetableJsonPath, subjectsJsonPath, timetableTextFilepath):
+    processor = TimetableProcessor()
+    processor.load_json(timetableJsonPath, subjectsJsonPath)
+    with open(timetableTextFilepath, 'w', encoding='utf-8') as f:
+        f.write(processor.generate_structured_text())
+    return timetableTextFilepath
+
+
+def parse_key(excel_file_path):
+    """Artifact key of a workbook's parsed records: its bytes plus everything that shapes the output"""
+    return combined_key([file_hash(excel_file_path)], "parse", PARSE_CACHE_VERSION,
+                        RecordFiles.RECORD_FORMAT, RecordFiles.RECORD_SCHEMA_VERSION)
+
+
+def parsed_workbooks(excel_file_paths, store):
+    """Parsed-record artifacts {excel_file_path: manifest} and per-file reports in input order.
+    Only workbooks whose bytes were never parsed before go to the parser; the others are served
+    from the artifact store."""
+    keys = {excel_file_path: parse_key(excel_file_path) for excel_file_path in excel_file_paths}
+    stored = {}
+    pending = {}  # key -> first workbook of the batch with those bytes
+    for excel_file_path, key in keys.items():
+        if key in stored or key in pending:
+            continue
+        manifest = store.get(key)
+        if manifest is None:
+            pending[key] = excel_file_path
+        else:
+            stored[key] = manifest
+
+    parse_reports = {}
+    if pending:
+        staging_folders = {excel_file_path: store.staging(key) for key, excel_file_path in pending.items()}
+        results, file_reports = ExcelDataParserJson.parse_excel_files(list(staging_folders),
+                                                                      output_dirs=staging_folders)
+        for (key, excel_file_path), file_report in zip(pending.items(), file_reports):
+            parse_reports[excel_file_path] = {**file_report, "cached": False}
+            if excel_file_path in results:
+                stored[key] = store.commit(key, staging_folders[excel_file_path],
+                                           {"key": key, "report": file_report, **results[excel_file_path]})
+            else:
+                store.discard(staging_folders[excel_file_path])
+
+    reports = []
+    for excel_file_path, key in keys.items():
+        file_name = os.path.basename(excel_file_path)
+        if excel_file_path in parse_reports:
+            reports.append(parse_reports[excel_file_path])
+        elif key in stored:
+            reports.append({**stored[key]["report"], "file": file_name, "seconds": 0.0, "cached": True})
+        else:
+            # Same bytes as a workbook of this batch that failed to parse
+            reports.append({**parse_reports[pending[key]], "file": file_name})
+    artifacts = {excel_file_path: stored[key] for excel_file_path, key in keys.items() if key in stored}
+    return artifacts, reports
+
+
+def merged_records(artifacts, store):
+    """One record artifact for several parsed ones; each distinct set is merged once and kept"""
+    artifacts = sorted({artifact["key"]: artifact for artifact in artifacts}.values(),
+                       key=lambda artifact: artifact["key"])
+    if len(artifacts) == 1:
+        return artifacts[0]
+    key = combined_key([artifact["key"] for artifact in artifacts], "merge")
+    manifest = store.get(key)
+    if manifest is None:
+        staging_folder = store.staging(key)
+        manifest = store.commit(key, staging_folder,
+                                {"key": key, **ExcelDataParserJson.merge_record_files(artifacts, staging_folder)})
+    return manifest
+
+
+def labelled_records(groups, store):
+    """One record artifact for several (source metadata, record artifact) groups, every record labelled
+    with its group's department/term, so lectures and subjects of different uploads stay apart"""
+    parts = sorted(((artifact, {field: source_metadata[field] for field in RecordFiles.SOURCE_FIELDS
+                                if source_metadata.get(field)}) for source_metadata, artifact in groups),
+                   key=lambda part: (part[0]["key"], sorted(part[1].items())))
+    if len(parts) == 1 and not parts[0][1]:
+        return parts[0][0]
+    key = combined_key([json.dumps([artifact["key"], label], sort_keys=True) for artifact, label in parts], "label")
+    manifest = store.get(key)
+    if manifest is None:
+        staging_folder = store.staging(key)
+        output_files = ExcelDataParserJson.merge_record_files([artifact for artifact, _ in parts], staging_folder,
+                                                              [label for _, label in parts])
+        manifest = store.commit(key, staging_folder, {"key": key, **output_files})
+    return manifest
+
+
+def structured_text(artifact, store):
+    """Structured text of a record artifact, written once and kept as its own artifact"""
+    key = combined_key([artifact["key"]], "text")
+    manifest = store.get(key)
+    if manifest is None:
+        staging_folder = store.staging(key)
+        text_path = write_structured_text(artifact["timetable"]["filepath"], artifact["subjects"]["filepath"],
+                                          os.path.join(staging_folder, "timetable_structured.txt"))
+        manifest = store.commit(key, staging_folder, {"key": key, "textPath": text_path})
+    return manifest["textPath"]
+
+
+def store_upload(file_name, data, store=None):
+    """Artifact key of an uploaded workbook's bytes, stored under their sha256 with the original file
+    name, so uploads never overwrite each other and a re-upload of the same bytes is stored once"""
+    store = store or artifact_store
+    key = hashlib.sha256(data).hexdigest()
+    if store.get(key) is None:
+        staging_folder = store.staging(key)
+        file_name = os.path.basename(file_name)
+        with open(os.path.join(staging_folder, file_name), 'wb') as f:
+            f.write(data)
+        store.commit(key, staging_folder, {"key": key, "workbookPath": file_name})
+    return key
+
+
+def upload_workbooks(uploads, store):
+    """{workbook path: source metadata} of {upload key: source metadata}; evicted uploads are left out"""
+    workbooks = {}
+    for key, source_metadata in uploads.items():
+        manifest = store.get(key)
+        if manifest is not None:
+            workbooks[manifest["workbookPath"]] = source_metadata
+    return workbooks
+
+
+def record_groups(workbooks, store):
+    """Parse {workbook path: source metadata} and merge the records per department/term:
+    ([(source metadata, {workbook path: parsed artifact}, merged artifact)], per-file reports)"""
+    artifacts, file_reports = parsed_workbooks(list(workbooks), store)
+    if not artifacts:
+        failures = "; ".join(f"{file_report['file']}: {file_report['error']}" for file_report in file_reports)
+        raise ValueError(f"No workbook could be parsed ({failures})")
+
+    groups = {}
+    for excel_file_path, artifact in artifacts.items():
+        source_metadata = workbooks[excel_file_path]
+        group = groups.setdefault(json.dumps(source_metadata, sort_keys=True), (source_metadata, {}))
+        group[1][excel_file_path] = artifact
+    return [(source_metadata, group_artifacts, merged_records(list(group_artifacts.values()), store))
+            for source_metadata, group_artifacts in groups.values()], file_reports
+
+
+def session_records(groups, store):
+    """(artifact key, paths) of the session's record and text files over every group, each record
+    labelled with the department/term it was uploaded as"""
+    output_files = labelled_records([(source_metadata, records) for source_metadata, _, records in groups], store)
+    return output_files["key"], {"timetableJsonPath": output_files["timetable"]["filepath"],
+                                 "subjectsJsonPath": output_files["subjects"]["filepath"],
+                                 "timetableTextFilepath": structured_text(output_files, store)}
+
+
+def restore_session_records(uploads, store=None):
+    """Session record and text files of an earlier ingestion, rebuilt from its stored uploads after
+    eviction. Nothing is indexed or published, since the shards may since serve newer uploads; returns
+    None when an upload is no longer stored."""
+    store = store or artifact_store
+    with store.holding():
+        workbooks = upload_workbooks(uploads, store)
+        if not uploads or len(workbooks) < len(uploads):
+            return None
+        groups, _ = record_groups(workbooks, store)
+        return session_records(groups, store)[1]
+
+
+def ingest_workbooks(report, uploads, indexer, store=None):
+    """Uploaded workbooks ({upload key: source metadata}, see store_upload) -> timetable/subject record
+    files -> structured text -> embeddings -> published shards. Every output is a content-addressed
+    artifact keyed by the workbook bytes, so re-uploading a workbook skips parsing, merging and text
+    generation, and its unchanged record files resolve to the existing index. New workbooks are parsed
+    in parallel processes and a failed one is reported without stopping the batch; records are merged
+    per department/term so every shard gets a single index update."""
+    store = store or artifact_store
+    # Every artifact this job looks up or writes stays pinned until it finishes
+    with store.holding():
+        workbooks = upload_workbooks(uploads, store)
+        if len(workbooks) < len(uploads):
+            raise ValueError("Some uploaded workbooks are no longer stored, please upload them again")
+        report("parsing", 0.1)
+        groups, file_reports = record_groups(workbooks, store)
+
+        for i, (source_metadata, group_artifacts, output_files) in enumerate(groups):
+            shard = VectorStoreManager.shard_name(source_metadata, group_artifacts)
+            # The shard's index is resolved from these record files, so they must outlive later uploads
+            store.pin(f"shard:{shard}", [output_files["key"]])
+            report(f"embedding and indexing {shard}", 0.3 + 0.6 * i / len(groups))
+            indexer.index_folder((output_files["timetable"]["filepath"], output_files["subjects"]["filepath"]),
+                                 source_metadata, shard)
+
+        report("structuring", 0.9)
+        records_key, result = session_records(groups, store)
+        # Kept for the latest upload; sessions of earlier ones rebuild them from their uploads if evicted
+        store.pin("session", [records_key, combined_key([records_key], "text"), *uploads])
+        return {**result, "ingestionReport": file_reports, "ingestionSources": uploads}
@@ -1,62 +1,17 @@
-import json
-from collections import defaultdict
+from TimetableModel import TimetableModel
 
 
 class TimetableProcessor:
-    def __init__(self):
-        self.timetable_data = []
-        self.subjects_data = []
+    def __init__(self, model=None):
+        self.model = model or TimetableModel()
 
     def load_json(self, timetable_path, subjects_path):
-        """Load both JSON files"""
-        with open(timetable_path, 'r') as f:
-            self.timetable_data = json.load(f)
-        with open(subjects_path, 'r') as f:
-            self.subjects_data = json.load(f)
+        """Compile both record files (JSON, JSON Lines or Parquet) into the timetable model"""
+        self.model = TimetableModel.from_files(timetable_path, subjects_path)
 
     def process_data(self):
-        """Organize data by day -> semester -> lectures"""
-        organized_data = defaultdict(lambda: defaultdict(list))
-        abbreviations = {}
-
-        for entry in self.timetable_data:
-            # Get semester or default to "Other"
-            semester = entry.get("semester", "Other")
-
-            # Find matching subject info
-            subject_info = next(
-                (item for item in self.subjects_data
-                 if item["subject_abbreviation"] == entry["subject"]),
-                {
-                    "course_code": entry["subject"],
-                    "faculty_name": entry.get("faculty", ""),
-                    "faculty_abbreviation": entry.get("faculty", "")
-                }
-            )
-
-            # Create lecture entry
-            lecture = {
-                "time": entry["time"],
-                "subject": entry["subject"],
-                "subject_full": subject_info["course_code"],
-                "faculty": subject_info["faculty_abbreviation"],
-                "faculty_full": subject_info["faculty_name"],
-                "room": entry.get("room", ""),
-                "section": entry.get("section", "")
-            }
-
-            organized_data[entry["day"]][semester].append(lecture)
-
-            # Build abbreviations dictionary
-            if entry["subject"] not in abbreviations:
-                faculty_display = (f"{subject_info['faculty_name']} ({subject_info['faculty_abbreviation']})"
-                                   if subject_info['faculty_name'] else subject_info['faculty_abbreviation'])
-                abbreviations[entry["subject"]] = {
-                    "full_form": subject_info["course_code"],
-                    "faculty": faculty_display
-                }
-
-        return organized_data, abbreviations
+        """Lectures organized by day -> semester, and abbreviation details per subject"""
+        return self.model.organized_data, self.model.abbreviations
 
     def generate_structured_text(self):
         """Generate clean text output organized by day and semester"""
@@ -77,11 +32,14 @@ class TimetableProcessor:
                     if semester in organized_data[day]:
                         output_lines.append(f"\nSemester {semester}:")
 
-                        for lecture in sorted(organized_data[day][semester], key=lambda x: x["time"]):
-                            section = f" (Section {lecture['section']})" if lecture["section"] else ""
+                        for lecture in sorted(organized_data[day][semester], key=lambda x: x.time):
+                            details = [f"Section {lecture.section}"] if lecture.section else []
+                            if lecture.source:
+                                details.append(lecture.source)
+                            section = f" ({', '.join(details)})" if details else ""
                             output_lines.append(
-                                f"{lecture['time']}: {lecture['subject']} - {lecture['faculty_full']}" +
-                                f" - Room {lecture['room']}{section}"
+                                f"{lecture.time}: {lecture.subject} - {lecture.faculty_full}" +
+                                f" - Room {lecture.room}{section}"
                             )
 
         # Add abbreviations
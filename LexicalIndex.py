@@ -0,0 +1,92 @@
+import json
+import math
+import re
+from collections import Counter, defaultdict
+
+from langchain_core.documents import Document
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-/:][a-z0-9]+)*")
+RRF_K = 60
+
+
+def tokenize(text):
+    """Lowercased words; codes such as CR-205 or 22CT501:DBMS also index their parts and the joined form"""
+    tokens = []
+    for match in TOKEN_PATTERN.findall(text.lower()):
+        parts = re.split(r"[-/:]", match)
+        if len(parts) > 1:
+            tokens.append("".join(parts))
+        tokens.extend(parts)
+    return tokens
+
+
+class BM25Index:
+    """In-memory inverted index scored with BM25; exact tokens such as subject abbreviations,
+    faculty initials, room numbers and course codes match here where embeddings are weak"""
+
+    def __init__(self, documents, k1=1.2, b=0.75):
+        self.documents = documents
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)
+        self.doc_lengths = []
+        for doc_idx, document in enumerate(documents):
+            term_counts = Counter(tokenize(document.page_content))
+            self.doc_lengths.append(sum(term_counts.values()))
+            for term, count in term_counts.items():
+                self.postings[term].append((doc_idx, count))
+        self.average_length = sum(self.doc_lengths) / len(self.doc_lengths) if self.doc_lengths else 0.0
+
+    def idf(self, term):
+        document_frequency = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.documents) - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def search(self, query, k=4, filter=None):
+        """Return [(document, score)] best first; filter is a callable over document metadata"""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for doc_idx, count in postings:
+                length_norm = 1 - self.b + self.b * self.doc_lengths[doc_idx] / (self.average_length or 1.0)
+                scores[doc_idx] += idf * count * (self.k1 + 1) / (count + self.k1 * length_norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        results = []
+        for doc_idx, score in ranked:
+            document = self.documents[doc_idx]
+            if filter is not None and not filter(document.metadata):
+                continue
+            results.append((document, score))
+            if len(results) == k:
+                break
+        return results
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump([{"page_content": document.page_content, "metadata": document.metadata}
+                       for document in self.documents], f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls([Document(**entry) for entry in json.load(f)])
+
+
+def document_key(document):
+    return document.metadata.get("chunk_id") or document.page_content
+
+
+def reciprocal_rank_fusion(result_lists, k=4, rrf_k=RRF_K):
+    """Fuse ranked document lists by summing 1 / (rrf_k + rank)"""
+    scores = defaultdict(float)
+    documents = {}
+    for results in result_lists:
+        for rank, document in enumerate(results):
+            key = document_key(document)
+            scores[key] += 1.0 / (rrf_k + rank + 1)
+            documents.setdefault(key, document)
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [documents[key] for key in ranked[:k]]
@@ -0,0 +1,159 @@
+import json
+import mmap
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Bump when a field is added, removed or changes meaning; readers refuse files from a newer schema
+RECORD_SCHEMA_VERSION = 2
+SCHEMA_KEY = "__schema__"
+# Format of newly parsed record files: "jsonl" (orjson-encoded JSON Lines) or "parquet" (needs pyarrow)
+RECORD_FORMAT = os.getenv("RECORD_FORMAT", "jsonl")
+RECORD_EXTENSIONS = {"jsonl": ".jsonl", "parquet": ".parquet"}
+PARQUET_BATCH_ROWS = 4096
+
+# department and term (schema 2) are only set on records merged from uploads of several departments/terms
+SOURCE_FIELDS = ("department", "term")
+TIMETABLE_FIELDS = ("semester", "section", "classroom", "day", "time", "period", "subject", "faculty", "room",
+                    *SOURCE_FIELDS)
+SUBJECT_FIELDS = ("course_code", "subject_abbreviation", "subject_type", "faculty_name", "faculty_abbreviation",
+                  *SOURCE_FIELDS)
+RECORD_FIELDS = {"timetable": TIMETABLE_FIELDS, "subjects": SUBJECT_FIELDS}
+
+
+def dumps(record):
+    """One compact JSON object as UTF-8 bytes"""
+    if orjson is not None:
+        return orjson.dumps(record)
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(line):
+    return orjson.loads(line) if orjson is not None else json.loads(line)
+
+
+def check_schema(path, version):
+    if version > RECORD_SCHEMA_VERSION:
+        raise ValueError(f"{path} uses record schema {version}, this version reads up to {RECORD_SCHEMA_VERSION}")
+
+
+def parquet_schema(kind):
+    """Arrow schema of a record kind; every string column is dictionary-encoded since semesters,
+    sections, days, times, rooms and faculty repeat across thousands of records"""
+    import pyarrow as pa
+
+    fields = [pa.field(name, pa.int16() if name == "period" else pa.dictionary(pa.int32(), pa.string()))
+              for name in RECORD_FIELDS[kind]]
+    return pa.schema(fields, metadata={"schema_version": str(RECORD_SCHEMA_VERSION), "kind": kind})
+
+
+class RecordWriter:
+    """Streams records of one kind to a .jsonl or .parquet file. JSON Lines files start with a
+    {"__schema__": {...}} header line; Parquet files carry the version in their schema metadata."""
+
+    def __init__(self, path, kind, record_format=RECORD_FORMAT):
+        if record_format not in RECORD_EXTENSIONS:
+            raise ValueError(f"Unknown record format {record_format!r}, expected one of {sorted(RECORD_EXTENSIONS)}")
+        self.path = path
+        self.kind = kind
+        self.record_format = record_format
+        self.count = 0
+        if record_format == "parquet":
+            import pyarrow.parquet as pq
+
+            self._schema = parquet_schema(kind)
+            self._batch = []
+            self._writer = pq.ParquetWriter(path, self._schema)
+        else:
+            self._file = open(path, 'wb')
+            self._file.write(dumps({SCHEMA_KEY: {"version": RECORD_SCHEMA_VERSION, "kind": kind}}) + b"\n")
+
+    def write(self, record):
+        self.count += 1
+        if self.record_format == "parquet":
+            self._batch.append(record)
+            if len(self._batch) >= PARQUET_BATCH_ROWS:
+                self._flush()
+        else:
+            self._file.write(dumps(record) + b"\n")
+
+    def _flush(self):
+        import pyarrow as pa
+
+        if self._batch:
+            self._writer.write_batch(pa.RecordBatch.from_pylist(self._batch, schema=self._schema))
+            self._batch = []
+
+    def close(self):
+        if self.record_format == "parquet":
+            self._flush()
+            self._writer.close()
+        else:
+            self._file.close()
+
+    def abort(self):
+        """Close and delete a partially written file"""
+        try:
+            if self.record_format == "parquet":
+                self._writer.close()
+            else:
+                self._file.close()
+        finally:
+            os.remove(self.path)
+
+
+def iter_jsonl_records(path):
+    """JSON Lines records read from a memory map, so lines go to the decoder as bytes without a
+    text-decoding pass or read buffer copy"""
+    if os.path.getsize(path) == 0:
+        return
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        for line in iter(mapped.readline, b""):
+            if not line.strip():
+                continue
+            record = loads(line)
+            if SCHEMA_KEY in record:
+                check_schema(path, record[SCHEMA_KEY]["version"])
+                continue
+            yield record
+
+
+def column_values(column):
+    """Python values of an Arrow column; a dictionary column converts each distinct string once and
+    indexes into it rather than materialising a string per row"""
+    import pyarrow as pa
+
+    if pa.types.is_dictionary(column.type) and column.null_count == 0:
+        dictionary = column.dictionary.to_pylist()
+        return [dictionary[index] for index in column.indices.to_numpy().tolist()]
+    return column.to_numpy().tolist() if column.null_count == 0 else column.to_pylist()
+
+
+def iter_parquet_records(path):
+    """Parquet records, memory-mapped and decoded column-wise one batch at a time"""
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path, memory_map=True)
+    metadata = parquet_file.schema_arrow.metadata or {}
+    check_schema(path, int(metadata.get(b"schema_version", b"1")))
+    for batch in parquet_file.iter_batches(batch_size=PARQUET_BATCH_ROWS):
+        # Unset department/term columns are left out, so unlabelled records read back as they were written
+        columns = [(name, column) for name, column in zip(batch.schema.names, batch.columns)
+                   if name not in SOURCE_FIELDS or column.null_count < len(column)]
+        names = [name for name, _ in columns]
+        for row in zip(*(column_values(column) for _, column in columns)):
+            yield dict(zip(names, row))
+
+
+def iter_records(path):
+    """Records of a parsed timetable/subjects file in any format the parser has written: .parquet,
+    schema-versioned .jsonl, or the original pretty-printed JSON array"""
+    if path.endswith(".parquet"):
+        return iter_parquet_records(path)
+    if path.endswith(".jsonl"):
+        return iter_jsonl_records(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        return iter(json.load(f))
@@ -0,0 +1,123 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.95"))
+
+DAY_WORDS = {"mon", "monday", "tue", "tues", "tuesday", "wed", "wednesday", "thu", "thur", "thurs", "thursday",
+             "fri", "friday", "sat", "saturday"}
+
+
+def normalize_question(question):
+    return " ".join(re.findall(r"[a-z0-9]+", question.lower()))
+
+
+def question_signature(normalized_question):
+    """Numbers, days and section letters must agree before two questions can share an answer;
+    embeddings alone barely separate "sem 5 monday" from "sem 7 monday" """
+    words = normalized_question.split()
+    signature = {word for word in words if word in DAY_WORDS or any(ch.isdigit() for ch in word)}
+    for previous, word in zip(words, words[1:]):
+        if previous in ("sec", "section"):
+            signature.add(f"section {word}")
+    return frozenset(signature)
+
+
+class ResponseCache:
+    """LRU + TTL cache of answers keyed by normalised question and index version, with a
+    second tier that reuses an answer whose question embedding is close enough to a cached one"""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, ttl_seconds=RESPONSE_CACHE_TTL,
+                 similarity_threshold=RESPONSE_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._semantic_keys = None
+        self._semantic_matrix = None
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "saved_seconds": 0.0}
+
+    def _expire(self, now):
+        expired = [key for key, entry in self._entries.items() if now - entry["created"] > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._semantic_keys = None
+
+    def _hit(self, key, kind):
+        self._entries.move_to_end(key)
+        entry = self._entries[key]
+        self.stats[kind] += 1
+        self.stats["saved_seconds"] += entry["latency"]
+        return entry["answer"]
+
+    def _semantic_lookup(self, normalized, index_version, embedding):
+        if self._semantic_keys is None:
+            self._semantic_keys = [key for key, entry in self._entries.items() if entry["embedding"] is not None]
+            self._semantic_matrix = (np.vstack([self._entries[key]["embedding"] for key in self._semantic_keys])
+                                     if self._semantic_keys else None)
+        if self._semantic_matrix is None:
+            return None
+
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        similarities = self._semantic_matrix @ query
+        signature = question_signature(normalized)
+        for position in np.argsort(-similarities):
+            if similarities[position] < self.similarity_threshold:
+                break
+            key = self._semantic_keys[position]
+            if key[1] == index_version and question_signature(key[0]) == signature:
+                return key
+        return None
+
+    def get(self, question, index_version, embed_fn=None):
+        """Return (answer, question_embedding); the embedding is only computed, via embed_fn,
+        when the exact tier misses, and is handed back so the caller can reuse it for search"""
+        normalized = normalize_question(question)
+        key = (normalized, index_version)
+        with self._lock:
+            self._expire(time.monotonic())
+            if key in self._entries:
+                return self._hit(key, "exact_hits"), None
+
+        if embed_fn is None:
+            with self._lock:
+                self.stats["misses"] += 1
+            return None, None
+
+        embedding = embed_fn(question)
+        with self._lock:
+            similar_key = self._semantic_lookup(normalized, index_version, embedding)
+            if similar_key in self._entries:
+                return self._hit(similar_key, "semantic_hits"), embedding
+            self.stats["misses"] += 1
+        return None, embedding
+
+    def put(self, question, index_version, answer, latency, embedding=None):
+        if embedding is not None:
+            embedding = np.asarray(embedding, dtype=np.float32)
+            embedding = embedding / (np.linalg.norm(embedding) or 1.0)
+        key = (normalize_question(question), index_version)
+        with self._lock:
+            self._entries[key] = {"answer": answer, "created": time.monotonic(), "latency": latency,
+                                  "embedding": embedding}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._semantic_keys = None
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["exact_hits"] + stats["semantic_hits"]) / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,74 @@
+from collections import defaultdict
+
+from langchain_core.documents import Document
+
+from TimetableQueryEngine import normalize_section, normalize_semester
+
+DAY_ORDER = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+
+
+def _day_rank(day):
+    return DAY_ORDER.index(day) if day in DAY_ORDER else len(DAY_ORDER)
+
+
+def source_prefix(source_metadata):
+    """Department/term prefix that keeps chunk ids unique across uploaded timetables"""
+    parts = [source_metadata.get(field) for field in ("department", "term")]
+    return "".join(f"{part}:" for part in parts if part)
+
+
+def timetable_block_chunk(day, semester, section, lectures, source_metadata=None):
+    """One compact chunk for a day/semester/section block"""
+    source_metadata = source_metadata or {}
+    heading = f"{day} - Semester {semester}" + (f" - Section {section}" if section else "")
+    lines = [heading]
+    for lecture in sorted(lectures, key=lambda x: x.time):
+        lines.append(f"{lecture.time}: {lecture.subject} - {lecture.faculty_full} - Room {lecture.room}")
+    # Filterable fields are stored normalised, the same way questions are parsed
+    return Document(
+        page_content="\n".join(lines),
+        metadata={
+            **source_metadata,
+            "chunk_id": f"{source_prefix(source_metadata)}timetable:{day}:{semester}:{section}",
+            "type": "timetable",
+            "day": day,
+            "semester": normalize_semester(semester),
+            "section": normalize_section(section)
+        }
+    )
+
+
+def abbreviation_chunk(abbreviation, details, source_metadata=None):
+    source_metadata = source_metadata or {}
+    return Document(
+        page_content=f"{abbreviation}: {details['full_form']} - {details['faculty']}",
+        metadata={
+            **source_metadata,
+            "chunk_id": f"{source_prefix(source_metadata)}abbreviation:{abbreviation}",
+            "type": "abbreviation",
+            "subject": abbreviation
+        }
+    )
+
+
+def chunk_timetable(processor, source_metadata=None):
+    """Record-aligned chunks from the processor's compiled timetable: one per day/semester/section
+    block plus one per subject abbreviation, each tagged with metadata and a stable chunk_id.
+    source_metadata (department, term) is copied onto every chunk."""
+    source_metadata = {key: value for key, value in (source_metadata or {}).items() if value}
+    organized_data, abbreviations = processor.process_data()
+    documents = []
+
+    for day in sorted(organized_data, key=_day_rank):
+        for semester in sorted(organized_data[day]):
+            lectures_by_section = defaultdict(list)
+            for lecture in organized_data[day][semester]:
+                lectures_by_section[lecture.section].append(lecture)
+            for section in sorted(lectures_by_section):
+                documents.append(timetable_block_chunk(day, semester, section, lectures_by_section[section],
+                                                       source_metadata))
+
+    for abbreviation, details in sorted(abbreviations.items()):
+        documents.append(abbreviation_chunk(abbreviation, details, source_metadata))
+
+    return documents
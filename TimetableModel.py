@@ -0,0 +1,91 @@
+import sys
+from collections import defaultdict
+
+from RecordFiles import SOURCE_FIELDS, iter_records
+
+
+def intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def source_label(record):
+    """Department/term a record was labelled with when uploads were merged, e.g. "CTECH odd-24-25", or "" """
+    return intern(" ".join(str(record[field]) for field in SOURCE_FIELDS if record.get(field)))
+
+
+class Subject:
+    """Course code and faculty of a subject abbreviation"""
+    __slots__ = ("course_code", "faculty_name", "faculty_abbreviation")
+
+    def __init__(self, course_code, faculty_name, faculty_abbreviation):
+        self.course_code = course_code
+        self.faculty_name = faculty_name
+        self.faculty_abbreviation = faculty_abbreviation
+
+    @property
+    def faculty_display(self):
+        return f"{self.faculty_name} ({self.faculty_abbreviation})" if self.faculty_name else self.faculty_abbreviation
+
+
+class Lecture:
+    """One timetable slot. Slots instead of a per-lecture dict, and every string is interned or shared
+    with its Subject, so thousands of lectures cost little more than their references."""
+    __slots__ = ("time", "subject", "subject_full", "faculty", "faculty_full", "room", "section", "source")
+
+    def __init__(self, time, subject, subject_full, faculty, faculty_full, room, section, source=""):
+        self.time = time
+        self.subject = subject
+        self.subject_full = subject_full
+        self.faculty = faculty
+        self.faculty_full = faculty_full
+        self.room = room
+        self.section = section
+        self.source = source
+
+
+class TimetableModel:
+    """Parsed timetable compiled once for the text, PDF and chunk generators: lectures organised by
+    day -> semester, abbreviation details per subject, and a hash lookup of subjects by abbreviation.
+    Building it is one pass over the records. Subjects are looked up within the department/term of the
+    record, so merged uploads may reuse an abbreviation."""
+
+    def __init__(self, timetable_records=(), subject_records=()):
+        self.subjects = {}
+        for record in subject_records:
+            key = (source_label(record), intern(record["subject_abbreviation"]))
+            # The first record of an abbreviation wins, as the linear scans this replaces did
+            if key not in self.subjects:
+                self.subjects[key] = Subject(record["course_code"], record["faculty_name"],
+                                             intern(record["faculty_abbreviation"]))
+
+        self.organized_data = defaultdict(lambda: defaultdict(list))
+        self.abbreviations = {}
+        for entry in timetable_records:
+            self.add(entry)
+
+    @classmethod
+    def from_files(cls, timetable_path, subjects_path):
+        """Compile straight from record files; timetable records are streamed, never held as a list"""
+        return cls(iter_records(timetable_path), iter_records(subjects_path))
+
+    def subject(self, entry):
+        """Subject of a timetable entry, or one made from the entry itself when it is not in the subject list"""
+        subject = self.subjects.get((source_label(entry), entry["subject"]))
+        if subject is None:
+            faculty = intern(entry.get("faculty", ""))
+            subject = Subject(entry["subject"], faculty, faculty)
+        return subject
+
+    def add(self, entry):
+        subject_abbreviation = intern(entry["subject"])
+        subject = self.subject(entry)
+        source = source_label(entry)
+        lecture = Lecture(intern(entry["time"]), subject_abbreviation, subject.course_code,
+                          subject.faculty_abbreviation, subject.faculty_name,
+                          intern(entry.get("room", "")), intern(entry.get("section", "")), source)
+        self.organized_data[intern(entry["day"])][intern(entry.get("semester", "Other"))].append(lecture)
+
+        abbreviation_key = f"{subject_abbreviation} ({source})" if source else subject_abbreviation
+        if abbreviation_key not in self.abbreviations:
+            self.abbreviations[abbreviation_key] = {"full_form": subject.course_code,
+                                                    "faculty": subject.faculty_display}
@@ -0,0 +1,249 @@
+import re
+import sys
+from collections import defaultdict
+
+from RecordFiles import iter_records
+from TimetableModel import source_label
+
+DAY_ORDER = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+DAY_ALIASES = {
+    "mon": "Monday", "monday": "Monday",
+    "tue": "Tuesday", "tues": "Tuesday", "tuesday": "Tuesday",
+    "wed": "Wednesday", "wednesday": "Wednesday",
+    "thu": "Thursday", "thur": "Thursday", "thurs": "Thursday", "thursday": "Thursday",
+    "fri": "Friday", "friday": "Friday",
+    "sat": "Saturday", "saturday": "Saturday",
+}
+ROMAN_NUMERALS = {"i": "1", "ii": "2", "iii": "3", "iv": "4", "v": "5", "vi": "6", "vii": "7", "viii": "8"}
+
+DAY_PATTERN = re.compile(r"\b(" + "|".join(sorted(DAY_ALIASES, key=len, reverse=True)) + r")\b")
+SEMESTER_PATTERN = re.compile(
+    r"\b(\d|i{1,3}|iv|v|vi{0,3})\s*(?:st|nd|rd|th)?\s*sem(?:ester)?\b|\bsem(?:ester)?\s*[:\-]?\s*(\d|i{1,3}|iv|v|vi{0,3})\b")
+SECTION_PATTERN = re.compile(r"\bsec(?:tion)?\s*[:\-]?\s*([a-z0-9]{1,2})\b")
+TIME_PATTERN = re.compile(r"\b(?:at\s+|@\s*)?(\d{1,2})(?::(\d{2}))?\s*(am|pm)?\b")
+ROOM_PATTERN = re.compile(r"\broom\s*(?:no\.?|number)?\s*[:\-]?\s*([a-z0-9\-/]+)")
+WORD_PATTERN = re.compile(r"[A-Za-z0-9\-/.]+")
+TITLED_NAME_PATTERN = re.compile(r"\b(?:prof|dr|mr|mrs|ms)\.?\s+([a-z]{3,})")
+
+SCHEDULE_WORDS = {"have", "has", "schedule", "lecture", "lectures", "class", "classes", "timetable", "where",
+                  "which", "who", "when", "period", "periods", "slot", "teach", "teaches", "taking", "free"}
+
+
+def normalize_semester(value):
+    value = str(value).strip().lower()
+    digits = re.findall(r"\d+", value)
+    if digits:
+        return digits[0]
+    return ROMAN_NUMERALS.get(value, value)
+
+
+def normalize_token(value):
+    return re.sub(r"[^a-z0-9]", "", str(value).lower())
+
+
+def normalize_section(value):
+    return normalize_token(value).upper()
+
+
+def extract_metadata_filters(question):
+    """Day, semester and section named in a question, normalised like chunk metadata"""
+    text = question.lower()
+    filters = {}
+    day = DAY_PATTERN.search(text)
+    if day:
+        filters["day"] = DAY_ALIASES[day.group(1)]
+    semester = SEMESTER_PATTERN.search(text)
+    if semester:
+        filters["semester"] = normalize_semester(semester.group(1) or semester.group(2))
+    section = SECTION_PATTERN.search(text)
+    if section:
+        filters["section"] = normalize_section(section.group(1))
+    return filters
+
+
+def start_hour(time_range):
+    """24h start hour of a slot such as '2:00-3:00'; afternoon slots are written 1-5"""
+    match = re.match(r"\s*(\d{1,2})", str(time_range))
+    if not match:
+        return None
+    hour = int(match.group(1))
+    return hour + 12 if hour < 8 else hour
+
+
+class TimetableQueryEngine:
+    """In-memory index over parsed timetable/subject records that answers exact schedule
+    lookups directly, so only open-ended questions need retrieval and the LLM"""
+
+    INDEXED_FIELDS = ("day", "semester", "section", "faculty", "room", "subject", "hour")
+
+    def __init__(self, timetable_data, subjects_data):
+        self.records = []
+        self.index = {field: defaultdict(set) for field in self.INDEXED_FIELDS}
+        # abbreviation -> {department/term label: subject}; records merged from several uploads
+        # carry the department/term they came from
+        self.subjects = defaultdict(dict)
+        self.faculty_names = {}
+
+        for subject in subjects_data:
+            abbreviation = normalize_token(subject["subject_abbreviation"])
+            self.subjects[abbreviation].setdefault(source_label(subject), subject)
+            faculty_abbreviation = normalize_token(subject.get("faculty_abbreviation", ""))
+            faculty_name = re.sub(r"\(.*?\)", "", subject.get("faculty_name", "")).strip().lower()
+            if faculty_abbreviation and faculty_name:
+                self.faculty_names.setdefault(faculty_name, faculty_abbreviation)
+
+        for entry in timetable_data:
+            record_id = len(self.records)
+            self.records.append(entry)
+            keys = {
+                "day": entry.get("day", ""),
+                "semester": normalize_semester(entry.get("semester", "")),
+                "section": normalize_token(entry.get("section", "")),
+                "faculty": normalize_token(entry.get("faculty", "")),
+                "room": normalize_token(entry.get("room", "")),
+                "subject": normalize_token(entry.get("subject", "")),
+                "hour": start_hour(entry.get("time", "")),
+            }
+            for field, key in keys.items():
+                if key:
+                    self.index[field][key].add(record_id)
+
+    @classmethod
+    def from_json(cls, timetable_path, subjects_path):
+        return cls(list(iter_records(timetable_path)), list(iter_records(subjects_path)))
+
+    def parse(self, question):
+        """Extract intent and slots (day, semester, section, hour, faculty, room, subject) from a question"""
+        text = question.lower()
+        # Case is kept only to tell faculty initials (written in capitals) from ordinary short words
+        original_words = WORD_PATTERN.findall(question)
+        words = [word.lower() for word in original_words]
+        # Slots are filled from the first matching word in question order, so answers do not
+        # depend on set iteration order (which changes between processes with hash randomisation)
+        ordered_tokens = [normalize_token(word) for word in words]
+        tokens = set(ordered_tokens)
+        slots = {}
+
+        day = DAY_PATTERN.search(text)
+        if day:
+            slots["day"] = DAY_ALIASES[day.group(1)]
+
+        semester = SEMESTER_PATTERN.search(text)
+        if semester:
+            slots["semester"] = normalize_semester(semester.group(1) or semester.group(2))
+
+        section = SECTION_PATTERN.search(text)
+        if section:
+            slots["section"] = normalize_token(section.group(1))
+
+        room = ROOM_PATTERN.search(text)
+        if room and normalize_token(room.group(1)) in self.index["room"]:
+            slots["room"] = normalize_token(room.group(1))
+        else:
+            known_rooms = [token for token in ordered_tokens if token in self.index["room"] and not token.isdigit()]
+            if known_rooms:
+                slots["room"] = known_rooms[0]
+
+        for match in TIME_PATTERN.finditer(text):
+            hour, minutes, meridiem = match.group(1), match.group(2), match.group(3)
+            # Bare numbers are only times when introduced by "at" or written like 10:00 / 10am
+            if not (meridiem or minutes or match.group(0).startswith(("at", "@"))):
+                continue
+            hour = int(hour)
+            if meridiem == "pm" and hour < 12:
+                hour += 12
+            elif not meridiem and hour < 8:
+                hour += 12
+            slots["hour"] = hour
+            break
+
+        titled_name = TITLED_NAME_PATTERN.search(text)
+        for name, abbreviation in self.faculty_names.items():
+            if name in text or (titled_name and titled_name.group(1) in name.split()):
+                slots["faculty"] = abbreviation
+                break
+        if "faculty" not in slots:
+            # Initials that are also subject abbreviations are read as the subject; lowercase words
+            # such as "am", "at" or "in" are never initials
+            for word, token in zip(original_words, ordered_tokens):
+                if word.isupper() and token in self.index["faculty"] and token not in self.subjects:
+                    slots["faculty"] = token
+                    break
+
+        for token in ordered_tokens:
+            if token in self.subjects and token != slots.get("faculty"):
+                slots["subject"] = token
+                break
+
+        if "who" in tokens and ("teach" in tokens or "teaches" in tokens or "taking" in tokens) \
+                and "subject" in slots and not ({"day", "hour"} & slots.keys()):
+            intent = "subject_faculty"
+        elif tokens & SCHEDULE_WORDS or slots:
+            intent = "schedule"
+        else:
+            intent = None
+        return intent, slots
+
+    def lookup(self, **filters):
+        """Records matching every given filter, intersecting the smallest posting lists first"""
+        postings = []
+        for field, value in filters.items():
+            if value is None:
+                continue
+            postings.append(self.index[field].get(value, set()))
+        if not postings:
+            return []
+        postings.sort(key=len)
+        matches = set(postings[0])
+        for posting in postings[1:]:
+            matches &= posting
+            if not matches:
+                break
+        records = [self.records[record_id] for record_id in matches]
+        records.sort(key=lambda r: (DAY_ORDER.index(r["day"]) if r.get("day") in DAY_ORDER else len(DAY_ORDER),
+                                    normalize_semester(r.get("semester", "")), r.get("section", ""),
+                                    r.get("period", 0)))
+        return records
+
+    def _is_answerable(self, slots):
+        # Enough slots to pin down a small, exact set of lectures
+        if "faculty" in slots or "room" in slots:
+            return bool({"day", "hour"} & slots.keys())
+        if "semester" in slots or "section" in slots:
+            return "day" in slots or "hour" in slots
+        return False
+
+    def _describe(self, record):
+        source = source_label(record)
+        subject = self.subjects.get(normalize_token(record.get("subject", "")), {}).get(source)
+        faculty = subject["faculty_name"] if subject and subject.get("faculty_name") else record.get("faculty", "")
+        section = f", Section {record['section']}" if record.get("section") else ""
+        source = f", {source}" if source else ""
+        return (f"{record['day']} {record['time']}: {record['subject']} - {faculty} - Room {record.get('room', '')}"
+                f" (Semester {record.get('semester', '')}{section}{source})")
+
+    def answer(self, question):
+        """Answer a schedule lookup directly, or return None so the caller falls back to RAG"""
+        intent, slots = self.parse(question)
+
+        if intent == "subject_faculty":
+            return "\n".join(f"{subject['subject_abbreviation']} ({subject['course_code']}) is taught by "
+                             f"{subject['faculty_name'] or subject['faculty_abbreviation']}"
+                             + (f" in {source}" if source else "") + "."
+                             for source, subject in self.subjects[slots["subject"]].items())
+
+        if intent != "schedule" or not self._is_answerable(slots):
+            return None
+
+        records = self.lookup(**slots)
+        if not records:
+            if "day" not in slots:
+                return None
+            return "No lecture is scheduled for that slot in the current timetable."
+        return "\n".join(self._describe(record) for record in records)
+
+
+if __name__ == "__main__":
+    engine = TimetableQueryEngine.from_json(sys.argv[1], sys.argv[2])
+    for line in sys.stdin:
+        print(engine.answer(line.strip()) or "(falls back to RAG)")
@@ -0,0 +1,714 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from LexicalIndex import BM25Index, reciprocal_rank_fusion
+
+INDEX_NAME = "index"
+MANIFEST_NAME = "partitions.json"
+# Chunks are split into sub-indexes by these metadata fields; a chunk without a field
+# (e.g. an abbreviation chunk has no semester) lands in a partition that matches any value
+PARTITION_FIELDS = ("department", "term", "semester")
+MAX_FILTERED_FETCH = 1000
+LEXICAL_INDEX_NAME = "lexical.json"
+VECTORS_NAME = "vectors.npy"
+HYBRID_CANDIDATES = 10
+
+# Runs the lexical side of hybrid searches next to the vector side, and the per-shard searches;
+# FAISS releases the GIL while searching, so shards are searched on all cores
+search_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="search")
+
+# FAISS index type for each partition: flat (exact), ivf or hnsw (approximate), and how the
+# vectors are stored: none (float32), fp16 / int8 (scalar quantized) or pq (product quantized)
+INDEX_CONFIG = {
+    "type": os.getenv("FAISS_INDEX_TYPE", "flat"),
+    "nlist": int(os.getenv("FAISS_NLIST", "256")),
+    "nprobe": int(os.getenv("FAISS_NPROBE", "16")),
+    "hnsw_m": int(os.getenv("FAISS_HNSW_M", "32")),
+    "ef_construction": int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", "80")),
+    "ef_search": int(os.getenv("FAISS_HNSW_EF_SEARCH", "64")),
+    "compression": os.getenv("FAISS_COMPRESSION", "none"),
+    "pq_m": int(os.getenv("FAISS_PQ_M", "16")),
+    "rerank": os.getenv("FAISS_RERANK", "false").lower() in ("1", "true", "yes"),
+    "rerank_factor": int(os.getenv("FAISS_RERANK_FACTOR", "4")),
+}
+# IVF wants roughly this many training vectors per list; nlist shrinks to fit small partitions
+IVF_POINTS_PER_LIST = 39
+# PQ trains 256 centroids per sub-quantizer, so it needs this many vectors; smaller partitions use int8
+PQ_TRAINING_POINTS = IVF_POINTS_PER_LIST * 256
+SEARCH_TIME_PARAMS = ("nprobe", "ef_search", "rerank", "rerank_factor")
+
+
+def pq_subquantizers(dim, pq_m):
+    """Largest number of PQ sub-quantizers <= pq_m that divides dim"""
+    return max(m for m in range(1, min(pq_m, dim) + 1) if dim % m == 0)
+
+
+def vector_codec(compression, vectors, config):
+    """FAISS factory suffix for the per-vector storage: Flat, SQfp16, SQ8 or PQ<m>"""
+    compression = compression.lower()
+    if compression == "none":
+        return "Flat"
+    if compression == "fp16":
+        return "SQfp16"
+    if compression == "int8":
+        return "SQ8"
+    if compression == "pq":
+        if len(vectors) < PQ_TRAINING_POINTS:
+            return "SQ8"
+        return f"PQ{pq_subquantizers(vectors.shape[1], config['pq_m'])}"
+    raise ValueError(f"Unknown FAISS compression '{compression}'. Choose one of: none, fp16, int8, pq")
+
+
+def create_faiss_index(vectors, config=None):
+    """Empty-but-trained FAISS index of the configured type and compression for the given float32 vectors"""
+    config = {**INDEX_CONFIG, **(config or {})}
+    dim = vectors.shape[1]
+    index_type = config["type"].lower()
+    codec = vector_codec(config["compression"], vectors, config)
+
+    nlist = min(config["nlist"], len(vectors) // IVF_POINTS_PER_LIST)
+    if index_type == "flat" or (index_type == "ivf" and nlist < 2):
+        # Too few vectors to train useful IVF lists; exact search is cheaper anyway
+        index = faiss.IndexFlatL2(dim) if codec == "Flat" else faiss.index_factory(dim, codec)
+    elif index_type == "ivf":
+        index = faiss.index_factory(dim, f"IVF{nlist},{codec}")
+    elif index_type == "hnsw":
+        if codec == "Flat":
+            index = faiss.IndexHNSWFlat(dim, config["hnsw_m"])
+        elif codec.startswith("PQ"):
+            index = faiss.IndexHNSWPQ(dim, int(codec[2:]), config["hnsw_m"])
+        else:
+            index = faiss.index_factory(dim, f"HNSW{config['hnsw_m']},{codec}")
+        index.hnsw.efConstruction = config["ef_construction"]
+    else:
+        raise ValueError(f"Unknown FAISS index type '{config['type']}'. Choose one of: flat, ivf, hnsw")
+
+    if not index.is_trained:
+        index.train(vectors)
+    apply_search_params(index, config)
+    return index
+
+
+def index_build_params(config=None):
+    """The parts of the index config that change what gets built (nprobe/efSearch/re-ranking do not)"""
+    config = {**INDEX_CONFIG, **(config or {})}
+    return {key: value for key, value in config.items() if key not in SEARCH_TIME_PARAMS}
+
+
+def apply_search_params(index, config=None):
+    """Set nprobe / efSearch; these are search-time knobs, so they also apply to saved indexes"""
+    config = {**INDEX_CONFIG, **(config or {})}
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(config["nprobe"], ivf.nlist)
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = config["ef_search"]
+
+
+def bytes_per_vector(index):
+    """Serialized size of an index divided by its vector count, codes and structure included"""
+    return len(faiss.serialize_index(index)) / max(index.ntotal, 1)
+
+
+def rerank_exact(query, positions, vectors, k):
+    """Re-score candidate positions by exact squared L2 against the original float32 vectors;
+    returns (positions, distances) best first"""
+    # Sorted positions read the memory-mapped matrix front to back
+    positions = np.unique(np.asarray([position for position in positions if position >= 0], dtype=np.int64))
+    differences = np.asarray(vectors[positions], dtype=np.float32) - np.asarray(query, dtype=np.float32)
+    distances = np.einsum("ij,ij->i", differences, differences)
+    order = np.argsort(distances)[:k]
+    return positions[order], distances[order]
+
+
+def supports_removal(index):
+    """Flat-coded indexes (Flat, SQ, PQ) compact their positions on remove_ids, which is what the
+    FAISS store's id mapping assumes; IVF keeps sparse ids and HNSW cannot remove at all"""
+    return isinstance(faiss.downcast_index(index), faiss.IndexFlatCodes)
+
+
+def document_digest(document):
+    return hashlib.sha256(json.dumps([document.page_content, document.metadata], sort_keys=True)
+                          .encode("utf-8")).hexdigest()
+
+
+def partition_key(metadata):
+    return tuple(metadata.get(field) for field in PARTITION_FIELDS)
+
+
+def link_folder(source, destination):
+    """Hard-link a folder's files into a new folder, copying where links are not possible"""
+    os.makedirs(destination, exist_ok=True)
+    for name in os.listdir(source):
+        try:
+            os.link(os.path.join(source, name), os.path.join(destination, name))
+        except OSError:
+            shutil.copy2(os.path.join(source, name), os.path.join(destination, name))
+
+
+def build_faiss_store(documents, vectors, embedding, config=None):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    index = create_faiss_index(vectors, config)
+    store = FAISS(embedding_function=embedding, index=index, docstore=InMemoryDocstore(), index_to_docstore_id={})
+    ids = [document.metadata.get("chunk_id") for document in documents]
+    store.add_embeddings([(document.page_content, vector) for document, vector in zip(documents, vectors.tolist())],
+                         metadatas=[document.metadata for document in documents],
+                         ids=None if None in ids else ids)
+    return store
+
+
+def matches_filters(metadata, filters):
+    """Missing metadata fields act as wildcards so shared chunks survive filtering"""
+    return all(metadata.get(field) in (None, value) for field, value in filters.items())
+
+
+def targets_filters(metadata, filters):
+    """Whether metadata sets any filtered field, i.e. matching it is more than a wildcard match"""
+    return any(metadata.get(field) is not None for field in filters)
+
+
+def metadata_fields(documents):
+    return {field for document in documents for field, value in document.metadata.items() if value is not None}
+
+
+def metadata_filter(filter):
+    """(non-empty filters, callable over document metadata or None)"""
+    filters = {field: value for field, value in (filter or {}).items() if value}
+    return filters, (lambda metadata: matches_filters(metadata, filters)) if filters else None
+
+
+class Partition:
+    """One sub-index: its PARTITION_FIELDS values, the FAISS store and, for compressed indexes, the
+    original float32 vectors in index order (memory-mapped when loaded from disk, so pages are only
+    read for the candidates that get re-ranked). source is the folder it was loaded from while it is
+    unmodified, so saving it again can link the files instead of rewriting them."""
+
+    def __init__(self, metadata, store, vectors=None, rerank=False, source=None):
+        self.metadata = metadata
+        self.store = store
+        self.vectors = vectors
+        self.rerank = rerank and vectors is not None
+        self.source = source
+        self.positions = {docstore_id: position for position, docstore_id in store.index_to_docstore_id.items()}
+
+    def documents(self):
+        docstore = self.store.docstore
+        return [docstore.search(docstore_id) for _, docstore_id in sorted(self.store.index_to_docstore_id.items())]
+
+    def remove(self, ids):
+        """Delete chunks by id in place; only for indexes where supports_removal()"""
+        positions = [self.positions[docstore_id] for docstore_id in ids]
+        self.store.delete(ids)
+        if self.vectors is not None:
+            self.vectors = np.delete(np.asarray(self.vectors), positions, axis=0)
+        self.positions = {docstore_id: position for position, docstore_id in self.store.index_to_docstore_id.items()}
+        self.source = None
+
+    def add(self, documents, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.store.add_embeddings([(document.page_content, vector)
+                                   for document, vector in zip(documents, vectors.tolist())],
+                                  metadatas=[document.metadata for document in documents],
+                                  ids=[document.metadata["chunk_id"] for document in documents])
+        if self.vectors is not None:
+            self.vectors = np.concatenate([np.asarray(self.vectors), vectors])
+        self.positions = {docstore_id: position for position, docstore_id in self.store.index_to_docstore_id.items()}
+        self.source = None
+
+    def search(self, embedding, k, doc_filter=None):
+        store = self.store
+        fetch_k = max(min(store.index.ntotal, MAX_FILTERED_FETCH), k)
+        if not self.rerank:
+            return store.similarity_search_with_score_by_vector(embedding, k=k, filter=doc_filter, fetch_k=fetch_k)
+
+        # Over-fetch from the compressed codes, then keep the k closest by exact distance
+        candidates = max(k * INDEX_CONFIG["rerank_factor"], k)
+        results = store.similarity_search_with_score_by_vector(embedding, k=candidates, filter=doc_filter,
+                                                               fetch_k=max(fetch_k, candidates))
+        documents = {self.positions[document.id]: document for document, _ in results}
+        positions, distances = rerank_exact(embedding, list(documents), self.vectors, k)
+        return [(documents[position], float(distance)) for position, distance in zip(positions, distances)]
+
+
+class PartitionedStore:
+    """A set of FAISS sub-indexes, one per partition of PARTITION_FIELDS values. Filtered searches
+    only touch the matching partitions, so their cost follows the partition size, not the corpus."""
+
+    def __init__(self, embedding_function, partitions, lexical_index=None):
+        self.embedding_function = embedding_function
+        self.partitions = partitions  # [Partition]
+        self.lexical_index = lexical_index
+        self.fields = metadata_fields(self.documents())
+
+    @classmethod
+    def from_embeddings(cls, documents, vectors, embedding, index_config=None):
+        groups = {}
+        for document, vector in zip(documents, vectors):
+            groups.setdefault(partition_key(document.metadata), []).append((document, vector))
+
+        config = {**INDEX_CONFIG, **(index_config or {})}
+        compressed = config["compression"].lower() != "none"
+        partitions = []
+        for key, items in groups.items():
+            partition_vectors = np.asarray([vector for _, vector in items], dtype=np.float32)
+            store = build_faiss_store([document for document, _ in items], partition_vectors, embedding, config)
+            partition_metadata = {field: value for field, value in zip(PARTITION_FIELDS, key) if value is not None}
+            # Compressed partitions keep the float32 originals for save_local and exact re-ranking
+            partitions.append(Partition(partition_metadata, store, partition_vectors if compressed else None,
+                                        config["rerank"]))
+
+        total_vectors = sum(partition.store.index.ntotal for partition in partitions)
+        total_bytes = sum(bytes_per_vector(partition.store.index) * partition.store.index.ntotal
+                          for partition in partitions)
+        print(f"Vector index: {total_vectors} vectors, {total_bytes / max(total_vectors, 1):.1f} bytes/vector "
+              f"({config['type']}, compression={config['compression']})")
+        return cls(embedding, partitions, BM25Index(list(documents)))
+
+    def documents(self):
+        return [document for partition in self.partitions for document in partition.documents()]
+
+    def diff(self, documents):
+        """(ids of stored chunks that are gone or changed, documents that are new or changed), matched
+        by chunk_id; None when some chunk has no id to match by"""
+        new = {document.metadata.get("chunk_id"): document for document in documents}
+        if None in new:
+            return None
+        old = {document.metadata.get("chunk_id"): document_digest(document) for document in self.documents()}
+        if None in old:
+            return None
+        removed = [chunk_id for chunk_id, digest in old.items()
+                   if chunk_id not in new or document_digest(new[chunk_id]) != digest]
+        added = [document for chunk_id, document in new.items()
+                 if chunk_id not in old or document_digest(document) != old[chunk_id]]
+        return removed, added
+
+    def apply_changes(self, removed_ids, documents, vectors, embed, index_config=None):
+        """Delete chunks by id and add new ones, touching only the partitions they belong to. Flat-coded
+        partitions are edited in place; IVF and HNSW partitions, whose ids cannot be removed and
+        compacted, are rebuilt from embed(documents) of their remaining and new chunks."""
+        config = {**INDEX_CONFIG, **(index_config or {})}
+        compressed = config["compression"].lower() != "none"
+        removed_ids = set(removed_ids)
+        additions = defaultdict(list)
+        for document, vector in zip(documents, vectors):
+            additions[partition_key(document.metadata)].append((document, vector))
+
+        partitions = []
+        for partition in self.partitions:
+            key = partition_key(partition.metadata)
+            removed = [docstore_id for docstore_id in partition.positions if docstore_id in removed_ids]
+            added = additions.pop(key, [])
+            if not removed and not added:
+                partitions.append(partition)
+                continue
+            if supports_removal(partition.store.index) and len(removed) < len(partition.positions):
+                if removed:
+                    partition.remove(removed)
+                if added:
+                    partition.add([document for document, _ in added], [vector for _, vector in added])
+                partitions.append(partition)
+                continue
+
+            kept = [Document(page_content=document.page_content, metadata=document.metadata)
+                    for document in partition.documents() if document.metadata.get("chunk_id") not in removed_ids]
+            if kept:
+                additions[key] = list(zip(kept, embed(kept))) + added
+            elif added:
+                additions[key] = added
+
+        # New partitions and rebuilt ones
+        for key, items in additions.items():
+            partition_vectors = np.asarray([vector for _, vector in items], dtype=np.float32)
+            store = build_faiss_store([document for document, _ in items], partition_vectors,
+                                      self.embedding_function, config)
+            partition_metadata = {field: value for field, value in zip(PARTITION_FIELDS, key) if value is not None}
+            partitions.append(Partition(partition_metadata, store, partition_vectors if compressed else None,
+                                        config["rerank"]))
+
+        self.partitions = partitions
+        self.lexical_index = BM25Index(self.documents())
+        self.fields = metadata_fields(self.documents())
+
+    def save_local(self, folder_name):
+        manifest = []
+        for i, partition in enumerate(self.partitions):
+            partition_folder = f"partition_{i:04d}"
+            store = partition.store
+            if partition.source is not None:
+                # Unchanged since it was loaded: link its files rather than serialising it again
+                link_folder(partition.source, os.path.join(folder_name, partition_folder))
+            else:
+                store.save_local(os.path.join(folder_name, partition_folder), index_name=INDEX_NAME)
+                if partition.vectors is not None:
+                    np.save(os.path.join(folder_name, partition_folder, VECTORS_NAME), partition.vectors)
+            manifest.append({"folder": partition_folder, "metadata": partition.metadata,
+                             "size": store.index.ntotal,
+                             "bytes_per_vector": round(bytes_per_vector(store.index), 1)})
+        if self.lexical_index is not None:
+            self.lexical_index.save(os.path.join(folder_name, LEXICAL_INDEX_NAME))
+        # The manifest is written last; its presence marks a complete index
+        with open(os.path.join(folder_name, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+    @classmethod
+    def load_local(cls, folder_name, embeddings):
+        manifest_path = os.path.join(folder_name, MANIFEST_NAME)
+        if not os.path.exists(manifest_path):
+            # Index saved before partitioning: a single unpartitioned store
+            store = FAISS.load_local(folder_name, embeddings, index_name=INDEX_NAME,
+                                     allow_dangerous_deserialization=True)
+            return cls(embeddings, [Partition({}, store)])
+
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        partitions = []
+        for entry in manifest:
+            partition_folder = os.path.join(folder_name, entry["folder"])
+            store = FAISS.load_local(partition_folder, embeddings,
+                                     index_name=INDEX_NAME, allow_dangerous_deserialization=True)
+            apply_search_params(store.index)
+            vectors_path = os.path.join(partition_folder, VECTORS_NAME)
+            vectors = np.load(vectors_path, mmap_mode="r") if os.path.exists(vectors_path) else None
+            partitions.append(Partition(entry["metadata"], store, vectors, INDEX_CONFIG["rerank"], partition_folder))
+        lexical_path = os.path.join(folder_name, LEXICAL_INDEX_NAME)
+        lexical_index = BM25Index.load(lexical_path) if os.path.exists(lexical_path) else None
+        return cls(embeddings, partitions, lexical_index)
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, filter=None):
+        """Search only the partitions compatible with filter, then merge by distance"""
+        filters, doc_filter = metadata_filter(filter)
+
+        results = []
+        for partition in self.partitions:
+            if matches_filters(partition.metadata, filters):
+                results.extend(partition.search(embedding, k, doc_filter))
+        if filters.keys() & self.fields and not any(targets_filters(document.metadata, filters)
+                                                    for document, _ in results):
+            # Only wildcard chunks such as abbreviations matched (e.g. a semester that is not loaded);
+            # search everything instead
+            return self.similarity_search_with_score_by_vector(embedding, k=k)
+
+        results.sort(key=lambda result: result[1])
+        return results[:k]
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None):
+        return [document for document, _ in self.similarity_search_with_score_by_vector(embedding, k, filter)]
+
+    def similarity_search(self, query, k=4, filter=None):
+        return self.similarity_search_by_vector(self.embedding_function.embed_query(query), k, filter)
+
+    def hybrid_search_by_vector(self, query, embedding, k=4, filter=None):
+        """BM25 over the query text and vector search over its embedding, run in parallel and
+        fused by reciprocal rank"""
+        if self.lexical_index is None:
+            return self.similarity_search_by_vector(embedding, k, filter)
+
+        _, doc_filter = metadata_filter(filter)
+        candidates = max(k, HYBRID_CANDIDATES)
+        lexical_future = search_pool.submit(self.lexical_index.search, query, candidates, doc_filter)
+        vector_results = self.similarity_search_by_vector(embedding, candidates, filter)
+        lexical_results = [document for document, _ in lexical_future.result()]
+        return reciprocal_rank_fusion([vector_results, lexical_results], k=k)
+
+
+class ShardedStore:
+    """Independently built PartitionedStores, one per shard (department/term or upload source).
+    Searches fan out to the shards compatible with the filter on search_pool and merge the per-shard top-k."""
+
+    def __init__(self, embedding_function, shards):
+        self.embedding_function = embedding_function
+        self.shards = shards  # [(shard_metadata, PartitionedStore)]
+
+    def _relevant_shards(self, filters):
+        shards = [(shard_metadata, store) for shard_metadata, store in self.shards
+                  if matches_filters(shard_metadata, filters)]
+        if not any(targets_filters(shard_metadata, filters) for shard_metadata, _ in shards):
+            # Only shards without department/term matched (e.g. a department that is not loaded);
+            # search everything instead
+            return [store for _, store in self.shards]
+        return [store for _, store in shards]
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, filter=None):
+        filters, _ = metadata_filter(filter)
+        futures = [search_pool.submit(store.similarity_search_with_score_by_vector, embedding, k, filter)
+                   for store in self._relevant_shards(filters)]
+        results = [result for future in futures for result in future.result()]
+        results.sort(key=lambda result: result[1])
+        return results[:k]
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None):
+        return [document for document, _ in self.similarity_search_with_score_by_vector(embedding, k, filter)]
+
+    def similarity_search(self, query, k=4, filter=None):
+        return self.similarity_search_by_vector(self.embedding_function.embed_query(query), k, filter)
+
+    def hybrid_search_by_vector(self, query, embedding, k=4, filter=None):
+        """Vector and BM25 searches of every relevant shard as separate pool tasks; each side is merged
+        across shards by score, then the two rankings are fused by reciprocal rank"""
+        filters, doc_filter = metadata_filter(filter)
+        candidates = max(k, HYBRID_CANDIDATES)
+        shards = self._relevant_shards(filters)
+        vector_futures = [search_pool.submit(store.similarity_search_with_score_by_vector, embedding, candidates,
+                                             filter) for store in shards]
+        lexical_futures = [search_pool.submit(store.lexical_index.search, query, candidates, doc_filter)
+                           for store in shards if store.lexical_index is not None]
+
+        vector_results = sorted((result for future in vector_futures for result in future.result()),
+                                key=lambda result: result[1])[:candidates]
+        lexical_results = sorted((result for future in lexical_futures for result in future.result()),
+                                 key=lambda result: result[1], reverse=True)[:candidates]
+        return reciprocal_rank_fusion([[document for document, _ in vector_results],
+                                       [document for document, _ in lexical_results]], k=k)
+
+
+def index_exists(folder_name):
+    return (os.path.exists(os.path.join(folder_name, MANIFEST_NAME))
+            or os.path.exists(os.path.join(folder_name, INDEX_NAME + ".faiss")))
+
+
+class RetrieverCache:
+    """Process-wide cache of loaded vector stores, shared by every Streamlit session and rerun"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._folder_locks = defaultdict(threading.Lock)
+        self._stores = {}
+
+    def index_version(self, folder_name):
+        """Version stamp of an index folder taken from the stats of the file written last"""
+        path = os.path.join(folder_name, MANIFEST_NAME)
+        if not os.path.exists(path):
+            path = os.path.join(folder_name, INDEX_NAME + ".faiss")
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, folder_name, embeddings):
+        """Return the resident store for a folder, loading it only when its version changed"""
+        version = self.index_version(folder_name)
+        cached = self._stores.get(folder_name)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        with self._lock:
+            folder_lock = self._folder_locks[folder_name]
+        # Per-folder lock: loading one shard never waits for another shard's load
+        with folder_lock:
+            # Another session may have loaded it while we waited for the lock
+            cached = self._stores.get(folder_name)
+            if cached and cached[0] == version:
+                return cached[1]
+
+            print(f"Loading vector store from {folder_name}")
+            store = PartitionedStore.load_local(folder_name, embeddings)
+            self._stores[folder_name] = (version, store)
+            return store
+
+    def invalidate(self, folder_name=None):
+        """Drop one cached store, or all of them"""
+        with self._lock:
+            if folder_name is None:
+                self._stores.clear()
+                self._folder_locks.clear()
+            else:
+                self._stores.pop(folder_name, None)
+                self._folder_locks.pop(folder_name, None)
+
+
+# Module level so the cache outlives Streamlit script reruns
+retriever_cache = RetrieverCache()
+
+
+INDEX_ROOT = "faiss_index_timetable"
+KEEP_INDEX_VERSIONS = 2
+SHARD_MANIFEST_NAME = "shards.json"
+# Reserved for the bundled structured text file; uploads are named after their department/term or file names
+TEXT_SHARD = "bundled-text"
+SHARD_FIELDS = ("department", "term")
+MAX_SHARD_NAME = 64
+
+
+def shard_name(source_metadata, source_names):
+    """Folder-safe shard name from the source department/term, e.g. CTECH_odd-24-25. Sources with
+    neither are named after their file names, e.g. upload-timetable, so a revised upload of the same
+    file replaces its shard and the bundled text shard is never replaced."""
+    parts = [str(source_metadata.get(field)) for field in SHARD_FIELDS if (source_metadata or {}).get(field)]
+    if not parts:
+        parts = ["upload", *sorted({os.path.splitext(os.path.basename(name))[0] for name in source_names})]
+    name = re.sub(r"[^A-Za-z0-9-]+", "-", "_".join(parts)).strip("-")
+    if len(name) > MAX_SHARD_NAME:
+        name = f"{name[:MAX_SHARD_NAME - 17]}-{hashlib.sha256(name.encode('utf-8')).hexdigest()[:16]}"
+    return name
+
+
+def index_key(documents, params):
+    """Content hash of the chunks (text and metadata) together with the embedding/index parameters"""
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8"))
+    for document in documents:
+        digest.update(document.page_content.encode("utf-8"))
+        digest.update(json.dumps(document.metadata, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class IndexManager:
+    """Content-addressed index folders under one root: <root>/<index_key>"""
+
+    def __init__(self, index_root=INDEX_ROOT, keep_versions=KEEP_INDEX_VERSIONS, cache=retriever_cache):
+        self.index_root = index_root
+        self.keep_versions = keep_versions
+        self.cache = cache
+        self._lock = threading.Lock()
+        self._source_stats = {}
+
+    def index_folder(self, documents, params):
+        return os.path.join(self.index_root, index_key(documents, params))
+
+    def ensure_index(self, documents, params, build):
+        """Return the folder matching documents+params, calling build(documents, folder) only if it is missing"""
+        folder = self.index_folder(documents, params)
+        with self._lock:
+            if index_exists(folder):
+                # Mark as recently used so garbage collection keeps it
+                os.utime(folder)
+                return folder
+
+            print(f"Building vector store in {folder}")
+            staging_folder = f"{folder}.tmp-{os.getpid()}"
+            shutil.rmtree(staging_folder, ignore_errors=True)
+            build(documents, staging_folder)
+            shutil.rmtree(folder, ignore_errors=True)
+            os.replace(staging_folder, folder)
+            self.collect_garbage(keep=folder)
+        return folder
+
+    def folder_for_sources(self, source_paths, params, load, build):
+        """Resolve the index for a set of source files; load(source_paths) turns them into chunk
+        documents and is only called again when one of the files changes"""
+        source_paths = tuple(source_paths)
+        stamp = [json.dumps(params, sort_keys=True)]
+        for path in source_paths:
+            stat = os.stat(path)
+            stamp.append((stat.st_mtime_ns, stat.st_size))
+        cached = self._source_stats.get(source_paths)
+        if cached and cached[0] == stamp and os.path.exists(cached[1]):
+            return cached[1]
+
+        documents = load(source_paths)
+        if not documents:
+            return None
+
+        folder = self.ensure_index(documents, params, build)
+        self._source_stats[source_paths] = (stamp, folder)
+        return folder
+
+    def collect_garbage(self, keep=None):
+        """Delete all but the most recently used index versions"""
+        if not os.path.isdir(self.index_root):
+            return
+        folders = [os.path.join(self.index_root, name) for name in os.listdir(self.index_root)]
+        folders = [folder for folder in folders if os.path.isdir(folder) and ".tmp-" not in folder]
+        folders.sort(key=os.path.getmtime, reverse=True)
+
+        for folder in folders[self.keep_versions:]:
+            if folder == keep:
+                continue
+            print(f"Removing stale vector store {folder}")
+            self.cache.invalidate(folder)
+            shutil.rmtree(folder, ignore_errors=True)
+
+
+class ShardRegistry:
+    """Which index folder serves each shard, persisted in <root>/shards.json so every worker process
+    sees the same set. Every shard is built by its own IndexManager (own folder root, lock and garbage
+    collection), so rebuilding one department never blocks another, and publish() hot-swaps a shard
+    by pointing it at a new folder; searches already running keep the store they started with."""
+
+    def __init__(self, index_root=INDEX_ROOT, cache=retriever_cache):
+        self.index_root = index_root
+        self.cache = cache
+        self._lock = threading.Lock()
+        self._managers = {}
+        self._shards = {}
+        self._manifest_version = None
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.index_root, SHARD_MANIFEST_NAME)
+
+    def manager(self, name):
+        with self._lock:
+            if name not in self._managers:
+                self._managers[name] = IndexManager(os.path.join(self.index_root, name), cache=self.cache)
+            return self._managers[name]
+
+    def _reload(self):
+        """Pick up shards published by other processes; call with the lock held"""
+        try:
+            stat = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return
+        version = stat.st_mtime_ns, stat.st_size
+        if version != self._manifest_version:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self._shards = json.load(f)
+            self._manifest_version = version
+
+    def publish(self, name, folder, metadata):
+        """Point a shard at a freshly built folder"""
+        with self._lock:
+            self._reload()
+            if self._shards.get(name, {}).get("folder") == folder:
+                return
+            self._write({**self._shards, name: {"folder": folder, "metadata": metadata}})
+            print(f"Shard {name} now served from {folder}")
+
+    def unpublish(self, name):
+        """Stop serving a shard; its folders are left to the shard's garbage collection. Returns
+        whether the shard was published."""
+        with self._lock:
+            self._reload()
+            entry = self._shards.get(name)
+            if entry is None:
+                return False
+            self._write({shard: shard_entry for shard, shard_entry in self._shards.items() if shard != name})
+        self.cache.invalidate(entry["folder"])
+        print(f"Shard {name} unpublished")
+        return True
+
+    def _write(self, shards):
+        """Replace the manifest atomically; call with the lock held"""
+        os.makedirs(self.index_root, exist_ok=True)
+        staging_path = f"{self.manifest_path}.tmp-{os.getpid()}"
+        with open(staging_path, 'w', encoding='utf-8') as f:
+            json.dump(shards, f, indent=2)
+        os.replace(staging_path, self.manifest_path)
+        stat = os.stat(self.manifest_path)
+        self._shards, self._manifest_version = shards, (stat.st_mtime_ns, stat.st_size)
+
+    def shards(self):
+        with self._lock:
+            self._reload()
+            return {name: entry for name, entry in self._shards.items() if index_exists(entry["folder"])}
+
+    def version(self):
+        """Changes whenever any shard is swapped; used to version cached answers"""
+        return tuple(sorted((name, entry["folder"]) for name, entry in self.shards().items()))
+
+    def store(self, embeddings):
+        """ShardedStore over the current folders; each shard stays resident in the retriever cache"""
+        return ShardedStore(embeddings, [(entry["metadata"], self.cache.get(entry["folder"], embeddings))
+                                         for entry in self.shards().values()])
+
+
+shard_registry = ShardRegistry()
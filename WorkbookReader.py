@@ -0,0 +1,112 @@
+import os
+from xml.etree.ElementTree import iterparse
+
+import xlrd
+
+MERGE_CELL_TAG = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}mergeCell"
+
+
+def xlsx_merged_ranges(worksheet):
+    """Merged ranges of an openpyxl read-only sheet as xlrd-style (rlo, rhi, clo, chi) tuples.
+    Read-only sheets do not load them, so the <mergeCell> elements are streamed out of the sheet XML."""
+    from openpyxl.utils.cell import range_boundaries
+
+    merged_cells = []
+    with worksheet._get_source() as source:
+        for _, element in iterparse(source):
+            if element.tag == MERGE_CELL_TAG:
+                min_col, min_row, max_col, max_row = range_boundaries(element.get("ref"))
+                merged_cells.append((min_row - 1, max_row, min_col - 1, max_col))
+            element.clear()
+    return merged_cells
+
+
+class ReadOnlyXlsxSheet:
+    """xlrd-like view (name, nrows, ncols, merged_cells, cell_value) of an openpyxl read-only sheet.
+    Rows are streamed forward; besides the current row only the top-left values of merged ranges are
+    kept, which is all the parser looks back at."""
+
+    def __init__(self, worksheet):
+        self.name = worksheet.title
+        self.merged_cells = xlsx_merged_ranges(worksheet)
+        if not (worksheet.max_row and worksheet.max_column):
+            worksheet.calculate_dimension(force=True)
+        self.nrows = worksheet.max_row or 0
+        self.ncols = worksheet.max_column or 0
+
+        self._anchor_columns = {}
+        for rlo, _, clo, _ in self.merged_cells:
+            self._anchor_columns.setdefault(rlo, []).append(clo)
+        self._anchor_values = {}
+        self._rows = worksheet.iter_rows(min_row=1, max_col=self.ncols, values_only=True)
+        self._row_idx = -1
+        self._row = ()
+
+    def _advance(self, row_idx):
+        while self._row_idx < row_idx:
+            self._row = tuple("" if value is None else value for value in next(self._rows, ()))
+            self._row_idx += 1
+            for col_idx in self._anchor_columns.get(self._row_idx, ()):
+                self._anchor_values[(self._row_idx, col_idx)] = self._cell(col_idx)
+
+    def _cell(self, col_idx):
+        return self._row[col_idx] if col_idx < len(self._row) else ""
+
+    def cell_value(self, row_idx, col_idx):
+        if row_idx < self._row_idx:
+            # Earlier rows are gone; only merged-range anchors are looked up again
+            return self._anchor_values.get((row_idx, col_idx), "")
+        self._advance(row_idx)
+        return self._cell(col_idx)
+
+
+def is_xlsx(file_path):
+    return os.path.splitext(file_path)[1].lower() in (".xlsx", ".xlsm")
+
+
+def workbook_sheet_names(file_path):
+    """Sheet names in workbook order, without loading any sheet"""
+    if is_xlsx(file_path):
+        import openpyxl
+
+        workbook = openpyxl.load_workbook(file_path, read_only=True)
+        try:
+            return list(workbook.sheetnames)
+        finally:
+            workbook.close()
+
+    workbook = xlrd.open_workbook(file_path, on_demand=True)
+    try:
+        return workbook.sheet_names()
+    finally:
+        workbook.release_resources()
+
+
+def iter_workbook_sheets(file_path, sheet_names=None):
+    """Yield the sheets of a workbook (or only sheet_names, in workbook order) one at a time, so memory
+    follows the largest sheet rather than the workbook: .xls sheets are loaded on demand and unloaded
+    once the caller moves on, .xlsx sheets are streamed in openpyxl read-only mode with merged ranges
+    resolved from the sheet XML"""
+    wanted = set(sheet_names) if sheet_names is not None else None
+    if is_xlsx(file_path):
+        import openpyxl
+
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            for worksheet in workbook.worksheets:
+                if wanted is None or worksheet.title in wanted:
+                    yield ReadOnlyXlsxSheet(worksheet)
+        finally:
+            workbook.close()
+        return
+
+    # formatting_info is what makes xlrd report merged_cells for .xls files
+    workbook = xlrd.open_workbook(file_path, on_demand=True, formatting_info=True)
+    try:
+        for sheet_name in workbook.sheet_names():
+            if wanted is not None and sheet_name not in wanted:
+                continue
+            yield workbook.sheet_by_name(sheet_name)
+            workbook.unload_sheet(sheet_name)
+    finally:
+        workbook.release_resources()
@@ -4,17 +4,23 @@ import streamlit as st
 from PIL import Image
 import os
 import datetime
+import time
 import pandas as pd
 from dotenv import load_dotenv
-from langchain.chains.question_answering import load_qa_chain
-from langchain_community.vectorstores import FAISS
-from langchain_core.prompts import PromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_google_genai import ChatGoogleGenerativeAI
 import google.generativeai as genai
 
 import ExcelDataParserJson
-from JsonToTextFile import TimetableProcessor
+from AnswerStreaming import TimedStream, build_answer_chain, format_documents
+from EmbeddingCache import EmbeddingCache
+from EmbeddingPipeline import EmbeddingPipeline
+from EmbeddingProviders import get_embedding_provider
+from ArtifactStore import artifact_store
+from IngestionJobs import (JobRunner, JobStore, TimetableIndexer, ingest_workbooks, restore_session_records,
+                           store_upload)
+from ResponseCache import ResponseCache
+import VectorStoreManager
+from TimetableQueryEngine import TimetableQueryEngine, extract_metadata_filters, normalize_section, normalize_semester
 
 load_dotenv()
 os.getenv("GOOGLE_API_KEY")
@@ -27,20 +33,44 @@ st.set_page_config(
 )
 
 
-def get_text_chunks(text):
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=10000, chunk_overlap=1000)
-    chunks = text_splitter.split_text(text)
-    return chunks
+DEFAULT_TEXT_FILE = r"C:\Users\snehal\PycharmProjects\ChatbotRAG\timetable_structured.txt"
 
 
-def get_vector_store(text_chunks, folder_name):
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
+@st.cache_resource(show_spinner=False)
+def get_embeddings():
+    # Remote Gemini embeddings by default; EMBEDDING_PROVIDER=hashing embeds locally on CPU
+    return get_embedding_provider()
 
-    if not os.path.exists(folder_name):
-        vector_store = FAISS.from_texts(text_chunks, embedding=embeddings)
-        vector_store.save_local(folder_name)
 
+@st.cache_resource(show_spinner=False)
+def get_embedding_cache():
+    return EmbeddingCache()
 
+
+@st.cache_resource(show_spinner=False)
+def get_embedding_pipeline():
+    # Shared so the requests-per-minute budget holds across concurrent builds
+    return EmbeddingPipeline(get_embeddings().embed_documents)
+
+
+@st.cache_resource(show_spinner=False)
+def get_indexer():
+    return TimetableIndexer(get_embeddings(), get_embedding_cache(), get_embedding_pipeline())
+
+
+@st.cache_resource(show_spinner=False)
+def get_job_runner():
+    # One pool per server process; status lives in SQLite so a rerun or another worker can poll it
+    return JobRunner(JobStore())
+
+
+def get_index_folder(textFilePath=DEFAULT_TEXT_FILE):
+    """Index folder for the bundled text file, published as its reserved shard. Uploaded workbooks are
+    indexed into their own shards by the ingestion job instead."""
+    return get_indexer().index_folder((textFilePath,), shard=VectorStoreManager.TEXT_SHARD)
+
+
+@st.cache_resource(show_spinner=False)
 def get_conversational_chain():
     prompt_template = """
     Answer the question as detailed as possible from the provided context, make sure to provide all the details, if the answer is not in
@@ -51,35 +81,108 @@ def get_conversational_chain():
     Answer:
     """
     model = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0.3)
-    prompt = PromptTemplate(template=prompt_template, input_variables=["context", "question"])
-    chain = load_qa_chain(model, chain_type="stuff", prompt=prompt)
+    chain = build_answer_chain(model, prompt_template)
     return chain
 
 
-def getModelResponse(user_question,
-                     textFilePath=r"C:\Users\snehal\PycharmProjects\ChatbotRAG\timetable_structured.txt"):
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    vector_store_folder = f"faiss_index_timetable"
+def get_search_filters(user_question):
+    """Metadata filters from the question, falling back to the student's class profile"""
+    filters = {key: value for key, value in st.session_state.get('profile', {}).items() if value}
+    filters.update(extract_metadata_filters(user_question))
+    return filters
 
-    # try:
-    #     new_db = FAISS.load_local(vector_store_folder, embeddings, allow_dangerous_deserialization=True)
-    # except (KeyError, FileNotFoundError) as e:
-    # st.warning(f"Error loading vector store: {str(e)}. Attempting to recreate the index.")
 
-    raw_text = open(textFilePath).read()
-    if raw_text:
-        text_chunks = get_text_chunks(raw_text)
-        get_vector_store(text_chunks, vector_store_folder)
-        new_db = FAISS.load_local(vector_store_folder, embeddings, allow_dangerous_deserialization=True)
-    else:
+def streamModelResponse(user_question, textFilePath=DEFAULT_TEXT_FILE):
+    """Yield the RAG answer token by token as the model generates it"""
+    # Index folders are keyed by the text content, so an edited text file is picked up on the
+    # next question; an unchanged one costs a stat call, and the stores themselves stay resident
+    if not st.session_state.get('timetableJsonPath') and not get_index_folder(textFilePath):
         st.error("Unable to process the PDF. Please check the file path and try again.")
         return
 
-    docs = new_db.similarity_search(user_question)
+    # Shard folder names are content hashes, so together with the filters they version cached answers
+    search_filters = get_search_filters(user_question)
+    answer_version = f"{VectorStoreManager.shard_registry.version()}|{sorted(search_filters.items())}"
+    start = time.perf_counter()
+    response_cache = get_response_cache()
+    cached_answer, question_embedding = response_cache.get(user_question, answer_version,
+                                                           get_embeddings().embed_query)
+    if cached_answer is not None:
+        yield cached_answer
+        return
+
+    # Every published shard is searched; the department filter narrows the fan-out
+    new_db = VectorStoreManager.shard_registry.store(get_embeddings())
+
+    docs = new_db.hybrid_search_by_vector(user_question, question_embedding, filter=search_filters)
     chain = get_conversational_chain()
-    response = chain({"input_documents": docs, "question": user_question}, return_only_outputs=True)
-    print("response['output_text'] - ", response["output_text"])
-    return response["output_text"]
+    answer = ""
+    for token in chain.stream({"context": format_documents(docs), "question": user_question}):
+        answer += token
+        yield token
+    print("response['output_text'] - ", answer)
+    response_cache.put(user_question, answer_version, answer, time.perf_counter() - start, question_embedding)
+
+
+def getModelResponse(user_question, textFilePath=DEFAULT_TEXT_FILE):
+    return "".join(streamModelResponse(user_question, textFilePath))
+
+
+@st.cache_resource(show_spinner=False)
+def get_response_cache():
+    return ResponseCache()
+
+
+@st.cache_resource(show_spinner=False)
+def get_query_engine(timetableJsonPath, subjectsJsonPath):
+    return TimetableQueryEngine.from_json(timetableJsonPath, subjectsJsonPath)
+
+
+def get_session_query_engine():
+    """Query engine over the session's records. Records evicted from the artifact store since they were
+    uploaded are rebuilt from the stored uploads, without re-indexing; None when those are gone too, so
+    questions go to RAG."""
+    try:
+        return get_query_engine(st.session_state.timetableJsonPath, st.session_state.subjectsJsonPath)
+    except FileNotFoundError:
+        result = restore_session_records(st.session_state.get('ingestionSources') or {})
+        if result is None:
+            for key in ('timetableJsonPath', 'subjectsJsonPath', 'timetableTextFilepath'):
+                st.session_state.pop(key, None)
+            return None
+        st.session_state.update(result)
+        return get_query_engine(st.session_state.timetableJsonPath, st.session_state.subjectsJsonPath)
+
+
+def streamAnswer(user_question):
+    """Answer exact schedule lookups from the timetable records, stream everything else through RAG"""
+    if st.session_state.get('timetableJsonPath'):
+        engine = get_session_query_engine()
+        answer = engine.answer(user_question) if engine else None
+        if answer:
+            yield answer
+            return
+    yield from streamModelResponse(user_question, st.session_state.get('timetableTextFilepath', DEFAULT_TEXT_FILE))
+
+
+@st.fragment(run_every=1)
+def show_ingestion_status(job_id):
+    """Polls the background job once a second without rerunning the rest of the page"""
+    job = get_job_runner().store.get(job_id)
+    if job is None:
+        return
+    if job["status"] in ("queued", "running"):
+        st.progress(job["progress"], text=f"{job['name']}: {job['stage']}...")
+        return
+
+    if job["status"] == "failed":
+        st.session_state.ingestionError = f"{job['name']}: {job['error']}"
+    else:
+        # Later questions in this session use the new records, text file and shard
+        for key, value in job["result"].items():
+            st.session_state[key] = value
+    del st.session_state.ingestionJobId
+    st.rerun(scope="app")
 
 
 # Custom College-Themed CSS
@@ -295,6 +398,25 @@ with col2:
     with st.container(height=750, border=False):
         st.markdown("## 💬 SAHAYAK Assistant")
         st.caption("Your 24/7 college helpdesk powered by AI")
+        cache_metrics = get_response_cache().metrics()
+        if cache_metrics["entries"]:
+            st.caption(f"Answer cache: {cache_metrics['hit_rate']:.0%} hit rate "
+                       f"({cache_metrics['exact_hits']} exact, {cache_metrics['semantic_hits']} similar), "
+                       f"{cache_metrics['saved_seconds']:.1f}s saved")
+
+        # Optional class profile, used to narrow retrieval when a question doesn't say
+        with st.expander("🎓 My class", expanded=False):
+            p1, p2, p3 = st.columns(3)
+            with p1:
+                profile_department = st.text_input("Department", placeholder="CTECH").strip().upper()
+            with p2:
+                profile_semester = st.text_input("Semester", placeholder="5").strip()
+            with p3:
+                profile_section = st.text_input("Section", placeholder="A").strip().upper()
+            # Normalised like chunk metadata, so "5th", "V" and "5" all select semester 5
+            st.session_state.profile = {"department": profile_department,
+                                        "semester": normalize_semester(profile_semester) if profile_semester else "",
+                                        "section": normalize_section(profile_section)}
 
         # Chat History Display
         chat_container = st.container(height=500)
@@ -320,8 +442,16 @@ with col2:
                     if user_input:
                         st.session_state.chat_history.append(f"You: {user_input}")
 
-                        # Simulate intelligent response
-                        model_response = getModelResponse(user_input)
+                        with chat_container:
+                            st.markdown(f'<div class="user-message">You: {user_input}</div>', unsafe_allow_html=True)
+                            bot_bubble = st.empty()
+
+                        # Render tokens into the bot bubble as they arrive
+                        answer_stream = TimedStream(streamAnswer(user_input))
+                        for _ in answer_stream:
+                            bot_bubble.markdown(f'<div class="bot-message">SAHAYAK: {answer_stream.text}▌</div>',
+                                                unsafe_allow_html=True)
+                        model_response = answer_stream.text
                         bot_response = f"SAHAYAK: '{model_response}'"
                         # bot_response = f"SAHAYAK: I can help with that! For '{user_input}', please check the college portal or contact your department."
                         st.session_state.chat_history.append(bot_response)
@@ -382,43 +512,56 @@ with col3:
             # File Upload Panel
             if st.session_state.get('show_upload', False):
                 with st.expander("📁 Upload Study Materials", expanded=True):
-                    uploaded_file = st.file_uploader("Select file to share",
-                                                     type=["xlsx", "xls"],
-                                                     accept_multiple_files=False,
-                                                     help="Timetables")
-                    if uploaded_file:
-                        if uploaded_file.type in [
-                            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                            "application/vnd.ms-excel"
-                        ] or uploaded_file.name.endswith('.xlsx'):
-                            st.success(f"✅ Uploaded: {uploaded_file.name}")
-                            st.caption(
-                                f"File type: {uploaded_file.type.split('/')[-1].upper()} | Size: {uploaded_file.size // 1024} KB")
-                            # Saving the uploaded excel file
-                            excel_file_path = ExcelDataParserJson.save_uploaded_file(uploaded_file,
-                                                                                     save_dir="uploaded_files")
-                            output_files = ExcelDataParserJson.excelToJsonConverter(excel_file_path)
-
-                            timetableJsonPath = output_files["timetable"]["filepath"]
-                            timetableJsonFilename = output_files["timetable"]["filename"]
-                            subjectsJsonPath = output_files["subjects"]["filepath"]
-                            subjectsJsonFilename = output_files["subjects"]["filename"]
-
-                            # Converting Excel to timetable and subjects json files
-                            processor = TimetableProcessor()
-                            processor.load_json(timetableJsonPath, subjectsJsonPath)
-                            st.session_state.structured_text = processor.generate_structured_text()
-                            print("st.session_state.structured_text -", st.session_state.structured_text)
-                            print("timetableJsonPath -", timetableJsonPath)
-                            print("timetableJsonFilename -", timetableJsonFilename)
-                            print("subjectsJsonPath -", subjectsJsonPath)
-                            print("subjectsJsonFilename -", subjectsJsonFilename)
-                            st.session_state.timetableTextFilepath = timetableJsonPath.replace(timetableJsonFilename, 'timetable_structured1.txt')
-                            print("st.session_state.timetableTextFilepath -", st.session_state.timetableTextFilepath)
-                            # Save to text file (or pass directly to your model)
-                            with open(st.session_state.timetableTextFilepath, 'w') as f:
-                                f.write(st.session_state.structured_text)
-                                print("Timetable Text saved")
+                    uploaded_files = st.file_uploader("Select files to share",
+                                                      type=["xlsx", "xls"],
+                                                      accept_multiple_files=True,
+                                                      help="Timetables")
+                    uploaded_files = [uploaded_file for uploaded_file in uploaded_files if uploaded_file.type in [
+                        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        "application/vnd.ms-excel"
+                    ] or uploaded_file.name.endswith('.xlsx')]
+                    if uploaded_files:
+                        st.success(f"✅ Uploaded {len(uploaded_files)} file(s), "
+                                   f"{sum(uploaded_file.size for uploaded_file in uploaded_files) // 1024} KB")
+                        # Department/term per workbook, guessed from the file name and editable
+                        sources = st.data_editor(
+                            pd.DataFrame([{"file": uploaded_file.name,
+                                           **ExcelDataParserJson.infer_source_metadata(uploaded_file.name)}
+                                          for uploaded_file in uploaded_files]),
+                            disabled=["file"], hide_index=True, use_container_width=True)
+                        if st.button("Process timetables", use_container_width=True,
+                                     disabled='ingestionJobId' in st.session_state):
+                            # Uploaded bytes are stored by content hash; parsing and indexing run as one background job
+                            uploads = {}
+                            for uploaded_file, source in zip(uploaded_files, sources.to_dict("records")):
+                                uploads[store_upload(uploaded_file.name, uploaded_file.getbuffer())] = {
+                                    "department": str(source["department"] or "").strip().upper(),
+                                    "term": str(source["term"] or "").strip().lower()}
+                            st.session_state.pop('ingestionError', None)
+                            st.session_state.ingestionJobId = get_job_runner().submit(
+                                f"{len(uploads)} timetable file(s)", ingest_workbooks, uploads, get_indexer())
+
+                    if 'ingestionJobId' in st.session_state:
+                        show_ingestion_status(st.session_state.ingestionJobId)
+                    elif st.session_state.get('ingestionError'):
+                        st.error(f"❌ {st.session_state.ingestionError}")
+                    elif st.session_state.get('timetableJsonPath'):
+                        st.caption(f"✅ Answering from {os.path.basename(st.session_state.timetableJsonPath)}")
+                    if st.session_state.get('ingestionReport'):
+                        # Per-file parse time and failures of the last batch
+                        st.dataframe(pd.DataFrame(st.session_state.ingestionReport), hide_index=True,
+                                     use_container_width=True)
+
+                    # Uploaded timetables every user searches; removing one unpublishes its shard
+                    upload_shards = sorted(name for name in VectorStoreManager.shard_registry.shards()
+                                           if name != VectorStoreManager.TEXT_SHARD)
+                    if upload_shards:
+                        shard_to_remove = st.selectbox("Published timetables", upload_shards, index=None,
+                                                       placeholder="Select a timetable to remove")
+                        if st.button("Remove timetable", use_container_width=True, disabled=shard_to_remove is None):
+                            VectorStoreManager.shard_registry.unpublish(shard_to_remove)
+                            artifact_store.release(f"shard:{shard_to_remove}")
+                            st.rerun()
 
             # Timetable Panel
             if st.session_state.get('show_timetable', False):